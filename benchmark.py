@@ -0,0 +1,1175 @@
+import argparse
+import ast
+import concurrent.futures
+import contextlib
+import cProfile
+import io
+import json
+import marshal
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import main as pume
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measures the performance of the stages of PUME",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    rename_parser = subparsers.add_parser("rename", help="Measures the time needed to change the names of a module")
+    rename_parser.add_argument(
+        "--sizes",
+        metavar="N",
+        type=int,
+        nargs="+",
+        default=[100, 200, 400, 800, 1600],
+        help="Number of functions of every generated module"
+    )
+
+    expand_parser = subparsers.add_parser("expand", help="Measures the time needed to expand the nodes of a module")
+    expand_parser.add_argument(
+        "--sizes",
+        metavar="N",
+        type=int,
+        nargs="+",
+        default=[100, 200, 400, 800, 1600],
+        help="Number of functions of every generated module"
+    )
+
+    strings_parser = subparsers.add_parser("strings", help="Measures the time needed to expand the strings of a "
+                                                           "localisation table")
+    strings_parser.add_argument(
+        "--sizes",
+        metavar="N",
+        type=int,
+        nargs="+",
+        default=[1000, 5000, 20000],
+        help="Number of entries of every generated table"
+    )
+
+    analyse_parser = subparsers.add_parser("analyse", help="Measures the time needed to analyse the names of a module")
+    analyse_parser.add_argument(
+        "--sizes",
+        metavar="N",
+        type=int,
+        nargs="+",
+        default=[100, 400, 1600, 6400],
+        help="Number of functions of every generated module"
+    )
+    analyse_parser.add_argument(
+        "--locals",
+        metavar="N",
+        type=int,
+        nargs="+",
+        default=[1000, 5000, 20000],
+        help="Number of local variables of the single function of every generated module"
+    )
+    analyse_parser.add_argument(
+        "--depths",
+        metavar="N",
+        type=int,
+        nargs="+",
+        default=[500, 1000, 2000],
+        help="Number of operations of the nested expression of every generated module"
+    )
+
+    comments_parser = subparsers.add_parser("comments", help="Measures the time needed to add comments to a code")
+    comments_parser.add_argument(
+        "--lines",
+        metavar="N",
+        type=int,
+        nargs="+",
+        default=[5000, 10000, 20000, 50000],
+        help="Number of lines of every generated code"
+    )
+
+    names_parser = subparsers.add_parser("names", help="Measures the time needed to generate names")
+    names_parser.add_argument(
+        "--count",
+        type=int,
+        default=1000000,
+        help="Number of names to generate"
+    )
+    names_parser.add_argument(
+        "--style",
+        choices=list(pume.NAME_STYLES),
+        default="letters",
+        help="Style of the generated names"
+    )
+    names_parser.add_argument(
+        "--length",
+        metavar=("MIN", "MAX"),
+        type=int,
+        nargs=2,
+        default=[5, 15],
+        help="Minimum and maximum length of the generated names"
+    )
+
+    mutate_parser = subparsers.add_parser("mutate", help="Measures the throughput and the memory of the whole mutation "
+                                                         "of generated corpora")
+    mutate_parser.add_argument(
+        "--lines",
+        metavar="N",
+        type=int,
+        nargs="+",
+        default=[100, 1000, 10000, 100000],
+        help="Number of lines of every generated corpus"
+    )
+    mutate_parser.add_argument(
+        "--modules",
+        type=int,
+        default=4,
+        help="Number of modules of every corpus"
+    )
+    mutate_parser.add_argument(
+        "--depth",
+        type=int,
+        default=2,
+        help="Nesting depth of the blocks of the functions"
+    )
+    mutate_parser.add_argument(
+        "--literals",
+        type=float,
+        default=0.5,
+        help="Probability of using an integer or string literal instead of a variable"
+    )
+    mutate_parser.add_argument(
+        "--classes",
+        type=float,
+        default=0.2,
+        help="Probability of generating a class instead of a function"
+    )
+    mutate_parser.add_argument(
+        "--no-imports",
+        action="store_true",
+        help="Do not import names between the modules"
+    )
+    mutate_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes used to mutate the files"
+    )
+    mutate_parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Save the corpus in a temporary directory and mutate its files in streaming mode"
+    )
+    mutate_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Number of measures of every corpus. The fastest one is kept"
+    )
+    mutate_parser.add_argument(
+        "--output",
+        metavar="FILE",
+        default=None,
+        help="JSON file where the results are saved"
+    )
+
+    bytecode_parser = subparsers.add_parser("bytecode", help="Compares the time needed to obtain the bytecode of the "
+                                                             "mutated files generating their code and without it")
+    bytecode_parser.add_argument(
+        "--lines",
+        metavar="N",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Number of lines of every generated corpus"
+    )
+    bytecode_parser.add_argument(
+        "--modules",
+        type=int,
+        default=4,
+        help="Number of modules of every corpus"
+    )
+    bytecode_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes used to mutate the files"
+    )
+
+    shard_parser = subparsers.add_parser("shard", help="Measures the time needed to mutate a big module with and "
+                                                       "without shards")
+    shard_parser.add_argument(
+        "--functions",
+        type=int,
+        default=20000,
+        help="Number of functions of the module"
+    )
+    shard_parser.add_argument(
+        "--jobs",
+        metavar="N",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4],
+        help="Numbers of processes used to mutate the module"
+    )
+    shard_parser.add_argument(
+        "--shard-lines",
+        type=int,
+        default=5000,
+        help="Approximate number of lines of every shard"
+    )
+
+    mapping_parser = subparsers.add_parser("mapping", help="Measures the time needed to mutate again one module of a "
+                                                           "corpus with and without a mapping file")
+    mapping_parser.add_argument(
+        "--lines",
+        metavar="N",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Number of lines of every generated corpus"
+    )
+    mapping_parser.add_argument(
+        "--modules",
+        type=int,
+        default=10,
+        help="Number of modules of every corpus"
+    )
+
+    duplicates_parser = subparsers.add_parser("duplicates", help="Measures the time needed to mutate a corpus with "
+                                                                 "copies of its modules")
+    duplicates_parser.add_argument(
+        "--lines",
+        type=int,
+        default=10000,
+        help="Number of lines of the generated corpus without the copies"
+    )
+    duplicates_parser.add_argument(
+        "--copies",
+        metavar="N",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8],
+        help="Numbers of copies of every module, like vendored modules"
+    )
+
+    consistency_parser = subparsers.add_parser("consistency", help="Checks that every mode of the mutation produces "
+                                                                   "the same code with the same seed")
+    consistency_parser.add_argument(
+        "--lines",
+        type=int,
+        default=1000,
+        help="Number of lines of the generated corpus"
+    )
+    consistency_parser.add_argument(
+        "--modules",
+        type=int,
+        default=4,
+        help="Number of modules of the corpus"
+    )
+    consistency_parser.add_argument(
+        "--seed",
+        type=int,
+        default=9,
+        help="Seed of the mutations"
+    )
+
+    serve_parser = subparsers.add_parser("serve", help="Measures the latency of the requests of the mutation server")
+    serve_parser.add_argument(
+        "--requests",
+        type=int,
+        default=200,
+        help="Number of requests sent to the server"
+    )
+    serve_parser.add_argument(
+        "--functions",
+        type=int,
+        default=5,
+        help="Number of functions of the module of every request"
+    )
+    serve_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes of the server"
+    )
+    serve_parser.add_argument(
+        "--cold",
+        type=int,
+        default=5,
+        help="Number of mutations of the same module performed running the program once per mutation"
+    )
+
+    runtime_parser = subparsers.add_parser("runtime", help="Measures the runtime overhead of the mutated code with and "
+                                                           "without the protection of the hot code")
+    runtime_parser.add_argument(
+        "--functions",
+        type=int,
+        default=5,
+        help="Number of functions with loops of the executed module"
+    )
+    runtime_parser.add_argument(
+        "--iterations",
+        type=int,
+        default=20000,
+        help="Number of iterations of the loops of every function"
+    )
+    runtime_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of executions of every version of the module. The fastest one is shown"
+    )
+    runtime_parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed of the mutations"
+    )
+
+    compare_parser = subparsers.add_parser("compare", help="Compares two results of the mutate benchmark")
+    compare_parser.add_argument("old", help="JSON file with the old results")
+    compare_parser.add_argument("new", help="JSON file with the new results")
+    args = parser.parse_args()
+
+    if args.benchmark == "rename":
+        benchmark_rename(args.sizes)
+    elif args.benchmark == "expand":
+        benchmark_expand(args.sizes)
+    elif args.benchmark == "strings":
+        benchmark_strings(args.sizes)
+    elif args.benchmark == "analyse":
+        benchmark_analyse(args.sizes, args.locals, args.depths)
+    elif args.benchmark == "comments":
+        benchmark_comments(args.lines)
+    elif args.benchmark == "names":
+        benchmark_names(args.count, args.style, args.length)
+    elif args.benchmark == "mutate":
+        benchmark_mutate(args.lines, args.modules, args.depth, args.literals, args.classes, not args.no_imports,
+                         args.jobs, args.stream, args.repeat, args.output)
+    elif args.benchmark == "bytecode":
+        benchmark_bytecode(args.lines, args.modules, args.jobs)
+    elif args.benchmark == "shard":
+        benchmark_shard(args.functions, args.jobs, args.shard_lines)
+    elif args.benchmark == "mapping":
+        benchmark_mapping(args.lines, args.modules)
+    elif args.benchmark == "duplicates":
+        benchmark_duplicates(args.lines, args.copies)
+    elif args.benchmark == "consistency":
+        check_consistency(args.lines, args.modules, args.seed)
+    elif args.benchmark == "serve":
+        benchmark_serve(args.requests, args.functions, args.jobs, args.cold)
+    elif args.benchmark == "runtime":
+        benchmark_runtime(args.functions, args.iterations, args.repeat, args.seed)
+    elif args.benchmark == "compare":
+        compare_results(args.old, args.new)
+
+
+def generate_module(functions):
+    """
+    It generates the source code of a module with global variables, functions and classes.
+    :param functions: The number of functions of the module
+    :return: The generated source code
+    """
+    lines = []
+    for i in range(functions):
+        lines.append("value_" + str(i) + " = " + str(i))
+    for i in range(functions):
+        lines.append("def function_" + str(i) + "(first_" + str(i) + ", second_" + str(i) + "):")
+        lines.append("    local_" + str(i) + " = first_" + str(i) + " + value_" + str(i))
+        lines.append("    other_" + str(i) + " = local_" + str(i) + " * second_" + str(i))
+        lines.append("    print(" + chr(34) + "function number " + str(i) + chr(34) + ")")
+        lines.append("    return other_" + str(i) + " - local_" + str(i))
+    for i in range(functions // 10):
+        lines.append("class Class_" + str(i) + ":")
+        lines.append("    def __init__(self, start_" + str(i) + "):")
+        lines.append("        self.attribute_" + str(i) + " = start_" + str(i))
+        lines.append("    def method_" + str(i) + "(self, step_" + str(i) + "):")
+        lines.append("        result_" + str(i) + " = self.attribute_" + str(i) + " + step_" + str(i))
+        lines.append("        return function_" + str(i) + "(result_" + str(i) + ", value_" + str(i) + ")")
+    return chr(10).join(lines) + chr(10)
+
+
+def generate_corpus(lines, modules=4, depth=2, literals=0.5, classes=0.2, imports=True, seed=0):
+    """
+    It generates the source code of a package with functions, classes, nested blocks, literals and imports between its
+    modules. Every module imports a function and a global variable of the previous one.
+    :param lines: The approximate number of lines of the whole package
+    :param modules: The number of modules
+    :param depth: The nesting depth of the blocks of the functions
+    :param literals: The probability of using an integer or string literal instead of a variable
+    :param classes: The probability of generating a class instead of a function
+    :param imports: If it is False, the modules do not import names between them
+    :param seed: The seed of the random generator
+    :return: A tuple with a list of the files and a list with the source code of every file
+    """
+    random_generator = random.Random(seed)
+    files = ["corpus/module_" + str(module) + ".py" for module in range(modules)]
+    codes = []
+    for module in range(modules):
+        code_lines = []
+        functions = []
+        values = ["value_" + str(module) + "_" + str(i) for i in range(3)]
+        if imports and module > 0:
+            previous = str(module - 1)
+            code_lines.append("from corpus.module_" + previous + " import function_" + previous + "_0, value_" +
+                              previous + "_0")
+            functions.append("function_" + previous + "_0")
+            values.append("value_" + previous + "_0")
+        for value in values[:3]:
+            code_lines.append(value + " = " + str(random_generator.randint(1, 1000)))
+
+        counter = [0]
+        unit = 0
+        while len(code_lines) < max(1, lines // modules):
+            name = str(module) + "_" + str(unit)
+            if unit > 0 and random_generator.random() < classes:
+                code_lines.append("class Class_" + name + ":")
+                code_lines.append("    def __init__(self, start):")
+                code_lines.append("        self.attribute_" + name + " = start")
+                code_lines.append("    def method_" + name + "(self, step):")
+                variables = ["self.attribute_" + name, "step"] + values
+                generate_block(code_lines, "        ", variables, functions, depth, literals, counter, random_generator)
+            else:
+                code_lines.append("def function_" + name + "(first, second):")
+                variables = ["first", "second"] + values
+                generate_block(code_lines, "    ", variables, functions, depth, literals, counter, random_generator)
+                functions.append("function_" + name)
+            unit += 1
+        codes.append(chr(10).join(code_lines) + chr(10))
+    return files, codes
+
+
+def generate_block(lines, indent, variables, functions, depth, literals, counter, random_generator):
+    """
+    It generates a block of statements that ends with a return statement.
+    :param lines: The list where the lines of the block are added
+    :param indent: The indentation of the block
+    :param variables: A list with the variables that can be used in the block
+    :param functions: A list with the functions that can be called in the block
+    :param depth: The number of blocks that can be nested inside the block
+    :param literals: The probability of using a literal instead of a variable
+    :param counter: A list with the number of generated variables, used to create unique names
+    :param random_generator: The random generator
+    :return:
+    """
+    variables = list(variables)
+    for _ in range(random_generator.randint(2, 4)):
+        variable = "local_" + str(counter[0])
+        counter[0] += 1
+        if random_generator.random() < literals / 4:
+            lines.append(indent + variable + " = " + chr(34) + "text " + variable + chr(34))
+            continue
+        if functions and random_generator.random() < 0.2:
+            arguments = [generate_operand(variables, literals, random_generator) for _ in range(2)]
+            lines.append(indent + variable + " = " + random_generator.choice(functions) + "(" + ", ".join(arguments) +
+                         ")")
+        else:
+            operands = [generate_operand(variables, literals, random_generator)
+                        for _ in range(random_generator.randint(2, 3))]
+            expression = operands[0]
+            for operand in operands[1:]:
+                expression += " " + random_generator.choice(["+", "-"]) + " " + operand
+            lines.append(indent + variable + " = " + expression)
+        variables.append(variable)
+
+    if depth > 0:
+        if random_generator.random() < 0.5:
+            lines.append(indent + "if " + generate_operand(variables, literals, random_generator) + " > " +
+                         str(random_generator.randint(1, 1000)) + ":")
+            generate_block(lines, indent + "    ", variables, functions, depth - 1, literals, counter,
+                           random_generator)
+            lines.append(indent + "else:")
+            generate_block(lines, indent + "    ", variables, functions, depth - 1, literals, counter,
+                           random_generator)
+            return
+        lines.append(indent + "for item in range(" + str(random_generator.randint(1, 5)) + "):")
+        generate_block(lines, indent + "    ", variables + ["item"], functions, depth - 1, literals, counter,
+                       random_generator)
+    lines.append(indent + "return " + variables[-1])
+
+
+def generate_operand(variables, literals, random_generator):
+    """
+    It generates an integer literal or chooses a variable.
+    :param variables: A list with the variables that can be used
+    :param literals: The probability of generating a literal
+    :param random_generator: The random generator
+    :return: A string with the operand
+    """
+    if random_generator.random() < literals:
+        return str(random_generator.randint(1, 1000))
+    return random_generator.choice(variables)
+
+
+def benchmark_rename(sizes):
+    """
+    It measures the time needed to generate and to apply the new names of modules of different sizes.
+    :param sizes: A list with the number of functions of every module
+    :return:
+    """
+    print("{:>10} {:>12} {:>10} {:>12} {:>12} {:>16}".format("functions", "identifiers", "nodes", "allocation",
+                                                              "renaming", "us/identifier"))
+    for size in sizes:
+        tree = ast.parse(generate_module(size))
+        names = pume.NameData()
+        exclusions = pume.manage_names([tree], names)
+        identifiers = sum(1 for node in ast.walk(tree) if isinstance(node, (ast.Name, ast.arg, ast.Attribute)))
+        nodes = sum(1 for _ in ast.walk(tree))
+
+        start = time.perf_counter()
+        name_generator = pume.NameGenerator(exclusions)
+        name_relations = pume.create_name_relations(names, name_generator)
+        local_relations = pume.create_local_relations(names, name_generator)
+        allocation = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pume.modify_names([tree], names, name_relations, local_relations)
+        renaming = time.perf_counter() - start
+
+        print("{:>10} {:>12} {:>10} {:>12.4f} {:>12.4f} {:>16.2f}".format(size, identifiers, nodes, allocation,
+                                                                        renaming, renaming / identifiers * 1000000))
+
+
+def benchmark_expand(sizes):
+    """
+    It measures the time needed to expand the nodes of modules of different sizes.
+    :param sizes: A list with the number of functions of every module
+    :return:
+    """
+    print("{:>10} {:>10} {:>12} {:>12}".format("functions", "nodes", "seconds", "us/node"))
+    for size in sizes:
+        tree = ast.parse(generate_module(size))
+        nodes = sum(1 for _ in ast.walk(tree))
+
+        start = time.perf_counter()
+        pume.expand_nodes([tree])
+        elapsed = time.perf_counter() - start
+
+        print("{:>10} {:>10} {:>12.4f} {:>12.2f}".format(size, nodes, elapsed, elapsed / nodes * 1000000))
+
+
+def generate_function(variables):
+    """
+    It generates the source code of a module with a single function that has a lot of local variables and a class with
+    a method that has a lot of attributes.
+    :param variables: The number of local variables of the function
+    :return: The generated source code
+    """
+    lines = ["def function(first):"]
+    for i in range(variables):
+        lines.append("    local_" + str(i) + " = first + " + str(i))
+    lines.append("    return first")
+    lines.append("class Class:")
+    lines.append("    def method(self, step):")
+    for i in range(variables):
+        lines.append("        self.attribute_" + str(i) + " = step + " + str(i))
+    return chr(10).join(lines) + chr(10)
+
+
+def generate_expression(depth):
+    """
+    It generates the source code of a module with a comprehension over a long chain of operations, a deep tree that
+    cannot be analysed with recursion.
+    :param depth: The number of operations of the chain
+    :return: The generated source code
+    """
+    lines = ["def function(first):"]
+    lines.append("    values = [item for item in " + " + ".join(["first"] * (depth + 1)) + "]")
+    lines.append("    return values")
+    return chr(10).join(lines) + chr(10)
+
+
+def benchmark_analyse(sizes, variables, depths):
+    """
+    It measures the time needed to analyse the names of wide modules, of functions with a lot of local variables and of
+    deep expressions, and the time needed to mutate them with Mutator.mutate_source, so every stage of the mutation is
+    checked with the same trees.
+    :param sizes: A list with the number of functions of every module
+    :param variables: A list with the number of local variables of every function
+    :param depths: A list with the number of operations of every expression
+    :return:
+    """
+    print("{:>10} {:>10} {:>10} {:>12} {:>12} {:>12}".format("module", "size", "nodes", "seconds", "us/node",
+                                                             "mutation"))
+    codes = [("wide", size, generate_module(size)) for size in sizes]
+    codes.extend(("locals", count, generate_function(count)) for count in variables)
+    codes.extend(("deep", depth, generate_expression(depth)) for depth in depths)
+    for kind, size, code in codes:
+        tree = ast.parse(code)
+        nodes = sum(1 for _ in ast.walk(tree))
+
+        start = time.perf_counter()
+        pume.manage_names([tree], pume.NameData())
+        elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pume.Mutator(seed=0).mutate_source(code)
+        mutation = time.perf_counter() - start
+
+        print("{:>10} {:>10} {:>10} {:>12.4f} {:>12.2f} {:>12.4f}".format(kind, size, nodes, elapsed,
+                                                                          elapsed / nodes * 1000000, mutation))
+
+
+def generate_table(entries):
+    """
+    It generates the source code of a localisation table, a dictionary of messages with quotes, escaped characters and
+    non ASCII characters.
+    :param entries: The number of messages of the table
+    :return: The generated source code
+    """
+    messages = ["Can" + chr(39) + "t open " + chr(34) + "{}" + chr(34) + " file",
+                "Línea número {} del año",
+                "Path C:" + chr(92) + "Users" + chr(92) + "{}",
+                "First line" + chr(10) + "Second line {}" + chr(9) + "end"]
+    lines = ["MESSAGES = {"]
+    for i in range(entries):
+        lines.append("    " + repr("message_" + str(i)) + ": " + repr(messages[i % len(messages)].format(i)) + ",")
+    lines.append("}")
+    return chr(10).join(lines) + chr(10)
+
+
+def benchmark_strings(sizes):
+    """
+    It measures the time needed to expand the strings of localisation tables of different sizes.
+    :param sizes: A list with the number of entries of every table
+    :return:
+    """
+    print("{:>10} {:>10} {:>12} {:>12}".format("entries", "strings", "seconds", "us/string"))
+    for size in sizes:
+        tree = ast.parse(generate_table(size))
+        strings = sum(1 for node in ast.walk(tree) if isinstance(node, ast.Constant) and isinstance(node.value, str))
+
+        start = time.perf_counter()
+        pume.expand_nodes([tree], ["strings"], random.Random(0))
+        elapsed = time.perf_counter() - start
+
+        print("{:>10} {:>10} {:>12.4f} {:>12.2f}".format(size, strings, elapsed, elapsed / strings * 1000000))
+
+
+def benchmark_comments(sizes):
+    """
+    It measures the time needed to add comments to codes of different sizes.
+    :param sizes: A list with the number of lines of every code
+    :return:
+    """
+    print("{:>10} {:>12} {:>12}".format("lines", "seconds", "us/line"))
+    for size in sizes:
+        code = chr(10).join("    value_" + str(i) + " = " + str(i) for i in range(size))
+
+        start = time.perf_counter()
+        pume.add_comments(code, random.Random(0))
+        elapsed = time.perf_counter() - start
+
+        print("{:>10} {:>12.4f} {:>12.2f}".format(size, elapsed, elapsed / size * 1000000))
+
+
+def benchmark_names(count, style, length):
+    """
+    It measures the time needed to generate names. The time of every tenth of the names is shown to check that it does
+    not grow with the number of generated names.
+    :param count: Number of names to generate
+    :param style: The style of the names
+    :param length: A list with the minimum and maximum length of the names
+    :return:
+    """
+    name_generator = pume.NameGenerator(random_generator=random.Random(0), style=style, min_len=length[0],
+                                        max_len=length[1])
+    step = max(1, count // 10)
+    print("{:>10} {:>12} {:>12}".format("names", "seconds", "us/name"))
+    total = 0
+    generated = 0
+    while generated < count:
+        names = min(step, count - generated)
+        start = time.perf_counter()
+        for _ in range(names):
+            name_generator.generate()
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        generated += names
+        print("{:>10} {:>12.4f} {:>12.2f}".format(generated, total, elapsed / names * 1000000))
+
+
+def benchmark_mutate(sizes, modules, depth, literals, classes, imports, jobs, stream, repeat, output):
+    """
+    It measures the throughput and the peak memory of the mutation of generated corpora of different sizes. Every
+    mutation is performed in a new process, so the peak memory of a corpus does not include the previous ones.
+    :param sizes: A list with the number of lines of every corpus
+    :param modules: The number of modules of every corpus
+    :param depth: The nesting depth of the blocks of the functions
+    :param literals: The probability of using a literal instead of a variable
+    :param classes: The probability of generating a class instead of a function
+    :param imports: If it is False, the modules do not import names between them
+    :param jobs: Number of processes used to mutate the files
+    :param stream: If it is True, the corpus is saved in a temporary directory and its files are mutated in streaming
+    mode
+    :param repeat: Number of measures of every corpus. The fastest one is kept
+    :param output: JSON file where the results are saved or None
+    :return:
+    """
+    results = []
+    print("{:>10} {:>10} {:>12} {:>14} {:>14}".format("size", "lines", "seconds", "lines/second", "peak RSS (MiB)"))
+    for size in sizes:
+        files, codes = generate_corpus(size, modules, depth, literals, classes, imports)
+        lines = sum(code.count(chr(10)) for code in codes)
+        measures = []
+        with tempfile.TemporaryDirectory() as directory:
+            if stream:
+                save_corpus(directory, files, codes)
+            for _ in range(repeat):
+                with concurrent.futures.ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as \
+                        executor:
+                    if stream:
+                        measures.append(executor.submit(measure_mutation, files, None, jobs, directory).result())
+                    else:
+                        measures.append(executor.submit(measure_mutation, files, codes, jobs).result())
+        seconds = min(measure[0] for measure in measures)
+        peak_rss = max(measure[1] for measure in measures) if resource is not None else None
+        results.append({"size": size, "lines": lines, "seconds": seconds, "lines_per_second": lines / seconds,
+                        "peak_rss": peak_rss})
+        print("{:>10} {:>10} {:>12.4f} {:>14.0f} {:>14}".format(
+            size, lines, seconds, lines / seconds, "-" if peak_rss is None else format(peak_rss / 1048576, ".1f")))
+
+    if output is not None:
+        report = {
+            "commit": get_commit(),
+            "python": platform.python_version(),
+            "options": {"modules": modules, "depth": depth, "literals": literals, "classes": classes,
+                        "imports": imports, "jobs": jobs, "stream": stream, "repeat": repeat},
+            "results": results,
+        }
+        with open(output, "w") as f:
+            json.dump(report, f, indent=4)
+
+
+def save_corpus(directory, files, codes):
+    """
+    It saves the files of a corpus in a directory.
+    :param directory: The directory
+    :param files: A list with the names of the files
+    :param codes: A list with the source code of the files
+    :return:
+    """
+    for file, code in zip(files, codes):
+        path = os.path.join(directory, file)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(code)
+
+
+def measure_mutation(files, codes, jobs, directory=None):
+    """
+    It mutates the code of a corpus and measures it.
+    :param files: A list with the names of the files
+    :param codes: A list with the source code of the files or None to mutate the files saved in the directory
+    :param jobs: Number of processes used to mutate the files
+    :param directory: The directory of the saved files, which are mutated in streaming mode, or None
+    :return: A tuple with the seconds of the mutation and the peak resident memory of the process and of its children
+    in bytes, or None if it cannot be measured
+    """
+    mutator = pume.Mutator(seed=0, jobs=jobs, stream=codes is None)
+    start = time.perf_counter()
+    if codes is None:
+        os.chdir(directory)
+        mutator.mutate_files(files)
+    else:
+        mutator.mutate(codes, files)
+    seconds = time.perf_counter() - start
+    if resource is None:
+        return seconds, None
+
+    # The maximum resident set size is measured in kilobytes in Linux and in bytes in macOS
+    peak_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    if sys.platform != "darwin":
+        peak_rss *= 1024
+    return seconds, peak_rss
+
+
+def benchmark_bytecode(sizes, modules, jobs):
+    """
+    It measures the time needed to mutate generated corpora and compile them, generating the mutated source code and
+    compiling it again as the interpreter would do when it is imported, and compiling the mutated trees directly.
+    :param sizes: A list with the number of lines of every corpus
+    :param modules: The number of modules of every corpus
+    :param jobs: Number of processes used to mutate the files
+    :return:
+    """
+    print("{:>10} {:>10} {:>14} {:>14} {:>10}".format("size", "lines", "source (s)", "bytecode (s)", "speedup"))
+    current_directory = os.getcwd()
+    for size in sizes:
+        files, codes = generate_corpus(size, modules)
+        lines = sum(code.count(chr(10)) for code in codes)
+        with tempfile.TemporaryDirectory() as directory:
+            save_corpus(directory, files, codes)
+            os.chdir(directory)
+            try:
+                start = time.perf_counter()
+                sources = pume.Mutator(seed=0, jobs=jobs).mutate_files(files)
+                for file, source in zip(files, sources):
+                    compile(source, file, "exec", dont_inherit=True)
+                source_seconds = time.perf_counter() - start
+
+                start = time.perf_counter()
+                pume.Mutator(seed=0, jobs=jobs, bytecode=True).mutate_files(files)
+                bytecode_seconds = time.perf_counter() - start
+            finally:
+                os.chdir(current_directory)
+        print("{:>10} {:>10} {:>14.4f} {:>14.4f} {:>9.2f}x".format(size, lines, source_seconds, bytecode_seconds,
+                                                                 source_seconds / bytecode_seconds))
+
+
+def benchmark_shard(functions, jobs, shard_lines):
+    """
+    It measures the time needed to mutate one big module in one process and split in shards.
+    :param functions: The number of functions of the module
+    :param jobs: A list with the numbers of processes used to mutate the module
+    :param shard_lines: The approximate number of lines of every shard
+    :return:
+    """
+    code = generate_module(functions)
+    lines = code.count(chr(10))
+    print("{:>10} {:>10} {:>14} {:>14} {:>10}".format("jobs", "lines", "module (s)", "shards (s)", "speedup"))
+    for job_count in jobs:
+        start = time.perf_counter()
+        pume.Mutator(seed=0, jobs=job_count).mutate([code], ["module.py"])
+        module_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pume.Mutator(seed=0, jobs=job_count, shard_lines=shard_lines).mutate([code], ["module.py"])
+        shard_seconds = time.perf_counter() - start
+        print("{:>10} {:>10} {:>14.4f} {:>14.4f} {:>9.2f}x".format(job_count, lines, module_seconds, shard_seconds,
+                                                                 module_seconds / shard_seconds))
+
+
+def benchmark_mapping(sizes, modules):
+    """
+    It measures the time needed to mutate again the last module of generated corpora, which imports the previous one,
+    mutating the whole corpus and mutating only that module with the mapping file of a previous mutation.
+    :param sizes: A list with the number of lines of every corpus
+    :param modules: The number of modules of every corpus
+    :return:
+    """
+    print("{:>10} {:>10} {:>14} {:>14} {:>10}".format("size", "lines", "corpus (s)", "module (s)", "speedup"))
+    current_directory = os.getcwd()
+    for size in sizes:
+        files, codes = generate_corpus(size, modules)
+        lines = sum(code.count(chr(10)) for code in codes)
+        with tempfile.TemporaryDirectory() as directory:
+            save_corpus(directory, files, codes)
+            os.chdir(directory)
+            try:
+                pume.Mutator(seed=0, mapping_file="mapping.json").mutate_files(files)
+
+                start = time.perf_counter()
+                pume.Mutator(seed=0).mutate_files(files)
+                corpus_seconds = time.perf_counter() - start
+
+                start = time.perf_counter()
+                pume.Mutator(seed=0, mapping_file="mapping.json").mutate_files(files[-1:])
+                module_seconds = time.perf_counter() - start
+            finally:
+                os.chdir(current_directory)
+        print("{:>10} {:>10} {:>14.4f} {:>14.4f} {:>9.2f}x".format(size, lines, corpus_seconds, module_seconds,
+                                                                 corpus_seconds / module_seconds))
+
+
+def benchmark_duplicates(lines, copies):
+    """
+    It measures the time needed to mutate a generated corpus with several copies of every module, sharing the mutation
+    of the copies and mutating every copy with its own random changes.
+    :param lines: The number of lines of the corpus without the copies
+    :param copies: A list with the numbers of copies of every module
+    :return:
+    """
+    files, codes = generate_corpus(lines)
+    print("{:>10} {:>10} {:>12} {:>14} {:>10}".format("copies", "files", "share (s)", "distinct (s)", "speedup"))
+    for copy_count in copies:
+        # The copies are saved in other directories, like the same helpers vendored in several packages
+        copy_files = [file.replace("corpus/", "copy_" + str(i) + "/") if i else file
+                      for i in range(copy_count) for file in files]
+        copy_codes = codes * copy_count
+
+        start = time.perf_counter()
+        pume.Mutator(seed=0, duplicates="share").mutate(copy_codes, copy_files)
+        share_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pume.Mutator(seed=0, duplicates="distinct").mutate(copy_codes, copy_files)
+        distinct_seconds = time.perf_counter() - start
+        print("{:>10} {:>10} {:>12.4f} {:>14.4f} {:>9.2f}x".format(copy_count, len(copy_files), share_seconds,
+                                                                 distinct_seconds, distinct_seconds / share_seconds))
+
+
+def remove_locations(tree):
+    """
+    It removes the positions of the nodes of a tree, so it is like a tree built without parsing code.
+    :param tree: An abstract syntax tree
+    :return: The same tree
+    """
+    for node in ast.walk(tree):
+        for attribute in node._attributes:
+            if attribute in vars(node):
+                delattr(node, attribute)
+    return tree
+
+
+def check_consistency(lines, modules, seed):
+    """
+    It mutates a generated corpus with the same seed in every mode that must produce the same code, compares the saved
+    files with the ones of a serial mutation and exits with an error if any mode produces other code. The corpus has a
+    copy of a module, so the modes are compared with shared and with distinct duplicates. The cache does not share
+    the duplicates, so it is compared with the distinct ones. The parsed trees of the corpus are also mutated with and
+    without the positions of their nodes, like the trees built without parsing code.
+    :param lines: The number of lines of the corpus
+    :param modules: The number of modules of the corpus
+    :param seed: The seed of the mutations
+    :return:
+    """
+    files, codes = generate_corpus(lines, modules)
+    files.append("corpus/module_copy.py")
+    codes.append(codes[-1])
+    current_directory = os.getcwd()
+    different = []
+    with tempfile.TemporaryDirectory() as directory:
+        save_corpus(directory, files, codes)
+        os.chdir(directory)
+        try:
+            cache = os.path.join(directory, "cache")
+            modes = [
+                ("serial", {}),
+                ("jobs", {"jobs": 2}),
+                ("stream", {"stream": True}),
+                ("stream jobs", {"stream": True, "jobs": 2}),
+                ("profile", {"profile": True}),
+                ("stream profile", {"stream": True, "profile": True}),
+                ("distinct", {"duplicates": "distinct"}),
+                ("stream distinct", {"stream": True, "duplicates": "distinct"}),
+                ("cache cold", {"cache": cache, "duplicates": "distinct"}),
+                ("cache warm", {"cache": cache, "duplicates": "distinct"}),
+                ("cache profile", {"cache": cache, "duplicates": "distinct", "profile": True}),
+            ]
+            expected = {}
+            print("{:<16} {:>8}".format("mode", "result"))
+            for mode, options in modes:
+                results = os.path.join(directory, pume.RESULTS_DIRECTORY)
+                if os.path.isdir(results) and mode != "cache warm":
+                    for file in files:
+                        os.remove(os.path.join(results, file))
+                pume.Mutator(seed=seed, **options).mutate_files(files)
+                sources = []
+                for file in files:
+                    with open(os.path.join(results, file)) as f:
+                        sources.append(f.read())
+                duplicates = options.get("duplicates", "share")
+                expected.setdefault(duplicates, sources)
+                if sources != expected[duplicates]:
+                    different.append(mode)
+                print("{:<16} {:>8}".format(mode, "same" if sources == expected[duplicates] else "DIFFERS"))
+            # The trees are never shared as duplicates, so they are compared between them
+            expected = pume.Mutator(seed=seed).mutate([ast.parse(code) for code in codes], files)
+            sources = pume.Mutator(seed=seed).mutate([remove_locations(ast.parse(code)) for code in codes], files)
+            if sources != expected:
+                different.append("trees")
+            print("{:<16} {:>8}".format("trees", "same" if sources == expected else "DIFFERS"))
+        finally:
+            os.chdir(current_directory)
+    if different:
+        sys.exit("the modes " + ", ".join(different) + " produce other code")
+
+
+def benchmark_serve(requests, functions, jobs, cold):
+    """
+    It measures the latency of the requests sent to a mutation server and compares it with running the program once
+    per mutation.
+    :param requests: Number of requests sent to the server
+    :param functions: Number of functions of the module of every request
+    :param jobs: Number of processes of the server
+    :param cold: Number of times the program is run
+    :return:
+    """
+    code = generate_module(functions)
+    latencies = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "pume.sock")
+        with pume.MutationServer(path, pume.Mutator(), jobs) as server:
+            server.warm_up()
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            with socket.socket(socket.AF_UNIX) as client:
+                client.connect(path)
+                stream = client.makefile("rwb")
+                for i in range(requests):
+                    start = time.perf_counter()
+                    stream.write(json.dumps({"id": i, "source": code}).encode() + b"\n")
+                    stream.flush()
+                    json.loads(stream.readline())
+                    latencies.append(time.perf_counter() - start)
+            server.shutdown()
+            thread.join()
+
+        # Every run of the program pays the startup of Python and the import of the program
+        cold_latencies = []
+        file = os.path.join(directory, "module.py")
+        with open(file, "w") as f:
+            f.write(code)
+        for _ in range(cold):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, os.path.abspath(pume.__file__), file], cwd=directory, check=True,
+                           stdout=subprocess.DEVNULL)
+            cold_latencies.append(time.perf_counter() - start)
+
+    print("{:>10} {:>10} {:>12} {:>12} {:>12}".format("mode", "requests", "mean (ms)", "p50 (ms)", "p99 (ms)"))
+    for mode, measures in (("server", latencies), ("process", cold_latencies)):
+        if not measures:
+            continue
+        measures.sort()
+        print("{:>10} {:>10} {:>12.2f} {:>12.2f} {:>12.2f}".format(
+            mode, len(measures), sum(measures) / len(measures) * 1000, measures[(len(measures) - 1) // 2] * 1000,
+            measures[(len(measures) - 1) * 99 // 100] * 1000))
+
+
+def generate_workload(functions, iterations):
+    """
+    It generates the source code of a module that spends most of its time in loops, which print a checksum.
+    :param functions: The number of functions with loops
+    :param iterations: The number of iterations of the loops of every function
+    :return: The generated source code
+    """
+    lines = []
+    for i in range(functions):
+        lines.extend([
+            "def work_{}(count):".format(i),
+            "    total = {}".format(i),
+            "    for value in range(count):",
+            "        if value % 3 == {}:".format(i % 3),
+            "            total += value * 7 + 13",
+            "        else:",
+            "            total ^= value",
+            "        label = 'item-' + str(value % 10)",
+            "        total += len(label)",
+            "    index = 0",
+            "    while index < count // 10:",
+            "        total -= index",
+            "        index += 1",
+            "    return total + sum([value * value for value in range(count // 10) if value % 2 == 0])",
+            "",
+            ""
+        ])
+    lines.append("if __name__ == '__main__':")
+    lines.append("    print([work_{}({}) for _ in range(2)])".format(functions - 1, iterations))
+    for i in range(functions - 1):
+        lines.append("    print(work_{}({}))".format(i, iterations))
+    return chr(10).join(lines) + chr(10)
+
+
+def run_workload(code):
+    """
+    It executes a module as the main module.
+    :param code: The compiled code of the module
+    :return: The time of the execution and the printed output
+    """
+    stream = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(stream):
+        exec(code, {"__name__": "__main__"})
+    return time.perf_counter() - start, stream.getvalue()
+
+
+def benchmark_runtime(functions, iterations, repeat, seed):
+    """
+    It measures the runtime and the size of the bytecode of a module with hot loops before and after mutating it,
+    with the default mutation, protecting the loops and protecting the functions of a profile too.
+    :param functions: The number of functions with loops
+    :param iterations: The number of iterations of the loops of every function
+    :param repeat: Number of executions of every version of the module
+    :param seed: Seed of the mutations
+    :return:
+    """
+    file = "workload.py"
+    code = generate_workload(functions, iterations)
+    with tempfile.TemporaryDirectory() as directory:
+        profile_file = os.path.join(directory, "workload.prof")
+        profiler = cProfile.Profile()
+        namespace = {"__name__": "__main__"}
+        with contextlib.redirect_stdout(io.StringIO()):
+            profiler.runctx(compile(code, file, "exec"), namespace, namespace)
+        profiler.dump_stats(profile_file)
+        hot_functions = pume.load_hot_functions(profile_file)
+
+    versions = [
+        ("original", code),
+        ("default", pume.Mutator(seed=seed).mutate_source(code, file)),
+        ("hot-code", pume.Mutator(seed=seed, hot_functions={}).mutate_source(code, file)),
+        ("profile", pume.Mutator(seed=seed, hot_functions=hot_functions).mutate_source(code, file))
+    ]
+    compiled = [compile(source, file, "exec") for _, source in versions]
+
+    # The versions are executed alternately, so a change of the speed of the machine affects all of them
+    seconds = [float("inf")] * len(versions)
+    outputs = [None] * len(versions)
+    for _ in range(repeat):
+        for i, code in enumerate(compiled):
+            elapsed, outputs[i] = run_workload(code)
+            seconds[i] = min(seconds[i], elapsed)
+
+    print("{:>10} {:>12} {:>10} {:>12} {:>8}".format("version", "seconds", "overhead", "pyc bytes", "output"))
+    for (version, _), code, elapsed, output in zip(versions, compiled, seconds, outputs):
+        # A pyc file has a header of 16 bytes before the marshalled code
+        print("{:>10} {:>12.4f} {:>9.1f}% {:>12} {:>8}".format(
+            version, elapsed, (elapsed / seconds[0] - 1) * 100, len(marshal.dumps(code)) + 16,
+            "same" if output == outputs[0] else "DIFFERS"))
+
+
+def get_commit():
+    """
+    It obtains the git commit of the measured code.
+    :return: A string with the hash of the commit or None if it is not a git repository
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(pume.__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(old, new):
+    """
+    It compares two results of the mutate benchmark corpus by corpus.
+    :param old: JSON file with the old results
+    :param new: JSON file with the new results
+    :return:
+    """
+    with open(old) as f:
+        old_report = json.load(f)
+    with open(new) as f:
+        new_report = json.load(f)
+    print("old commit:", old_report["commit"])
+    print("new commit:", new_report["commit"])
+    print("{:>10} {:>14} {:>14} {:>10} {:>12}".format("size", "old lines/s", "new lines/s", "speedup", "RSS ratio"))
+    old_results = {result["size"]: result for result in old_report["results"]}
+    for result in new_report["results"]:
+        old_result = old_results.get(result["size"])
+        if old_result is None:
+            continue
+        rss_ratio = "-"
+        if result["peak_rss"] and old_result["peak_rss"]:
+            rss_ratio = format(result["peak_rss"] / old_result["peak_rss"], ".2f")
+        print("{:>10} {:>14.0f} {:>14.0f} {:>10.2f} {:>12}".format(
+            result["size"], old_result["lines_per_second"], result["lines_per_second"],
+            result["lines_per_second"] / old_result["lines_per_second"], rss_ratio))
+
+
+if __name__ == "__main__":
+    main()
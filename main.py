@@ -1,52 +1,186 @@
 import argparse
 import ast
+import base64
+import builtins
+import collections
+import concurrent.futures
+import contextlib
+import copy
+import csv
+import functools
+import hashlib
+import importlib.util
+import io
+import json
+import keyword
+import marshal
+import math
+import operator
+import os
 import pathlib
+import pickle
+import posixpath
+import pstats
 import random
-import re
+import socket
+import socketserver
 import string
+import struct
+import sys
+import tarfile
+import threading
+import time
+import tracemalloc
+import zipfile
+
+TRANSFORMATIONS = ["reduce", "strings", "integers", "pass"]
+
+RESULTS_DIRECTORY = "./results"
+
+# Suffixes of the archives that can be mutated and their compression. The members of a zip archive keep their own
+# compression
+ARCHIVE_FORMATS = {".zip": "zip", ".whl": "zip", ".tar": "", ".tar.gz": "gz", ".tgz": "gz", ".tar.bz2": "bz2",
+                   ".tar.xz": "xz"}
+
+# Minimum share of the total time of a profile spent inside a function, without its calls, to consider it hot
+HOT_TIME_SHARE = 0.01
+
+# Minimum recursion limit of the processes that mutate code. The modifications of the nodes, ast.unparse, copy.deepcopy
+# and pickle visit the trees with recursion, so the default limit is reached with expressions of a few hundred
+# operations
+RECURSION_LIMIT = 30000
+
+# Functions that compute the operations between constants that can be reduced
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+    ast.BitAnd: operator.and_,
+}
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+    ast.Invert: operator.invert,
+}
+
+# Maximum number of bits of the reduced integers and maximum length of the reduced strings
+MAX_REDUCED_BITS = 4096
+MAX_REDUCED_LENGTH = 4096
+
+# Functions that evaluate the arithmetic operators used in the generated expressions
+ARITHMETIC_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Mod: operator.mod,
+    ast.FloorDiv: operator.floordiv,
+}
+
+# Characters used to generate names. Every style has the characters of the first position and the characters of the rest
+NAME_STYLES = {
+    "letters": (string.ascii_letters, string.ascii_letters),
+    "lowercase": (string.ascii_lowercase, string.ascii_lowercase),
+    "snake_case": (string.ascii_lowercase, string.ascii_lowercase + "_"),
+    "confusing": ("IlO", "Il1O0"),
+}
 
 
 class ReduceBinOp(ast.NodeTransformer):
+    def __init__(self):
+        """
+        It reduces the operations between constants bottom-up. The values are computed with the functions of the
+        operator module, so the code is never evaluated.
+        """
+        # Set with the BinOp and UnaryOp nodes that were already reduced, so they are not reduced again
+        self.reduced = set()
+
     def visit_BinOp(self, node):
         """
         It checks for all BinOp and tries to reduce de expression.
         :param node: The BinOp node to check.
-        :return: If the function can reduce the BinOp returns a constant, otherwise returns the same node.
+        :return: If the function can reduce the BinOp returns a constant, otherwise returns the same node with the
+        operations between constants of its operands reduced.
         """
-        constant = ""
-        try:
-            constant = ast.unparse(node)
-            evaluation = eval(constant, {'__builtins__': None}, {})
-            return ast.Constant(evaluation)
-        except:
-            math_operation_pattern = "[\d]+[\d\ \+\-\*\/\%]+[\d]"
-            results = re.findall(math_operation_pattern, constant)
-            for result in results:
-                evaluation = eval(result, {'__builtins__': None}, {})
-                constant = constant.replace(result, str(evaluation), 1)
-            new_node = ast.parse(constant)
-            return new_node.body[0].value
+        if node not in self.reduced:
+            node = self.reduce(node)
+        return self.generic_visit(node)
+
+    def reduce(self, node):
+        """
+        It reduces an operation and the operations of its operands. Every operation is visited once, after its
+        operands.
+        :param node: A BinOp or UnaryOp node
+        :return: A node with the value of the operation if it can be reduced, otherwise the same node
+        """
+        results = {}
+        stack = [(node, False)]
+        while stack:
+            current, ready = stack.pop()
+            if not ready:
+                self.reduced.add(current)
+                stack.append((current, True))
+                for operand in get_operands(current):
+                    if isinstance(operand, ast.BinOp) or isinstance(operand, ast.UnaryOp):
+                        stack.append((operand, False))
+                continue
+
+            # The operands were already reduced
+            if isinstance(current, ast.BinOp):
+                current.left = results.pop(current.left, current.left)
+                current.right = results.pop(current.right, current.right)
+                values = [get_constant_value(current.left), get_constant_value(current.right)]
+            else:
+                current.operand = results.pop(current.operand, current.operand)
+                values = [get_constant_value(current.operand)]
+            results[current] = current
+            if None in values:
+                continue
+            values = [value[0] for value in values]
+            if isinstance(current, ast.BinOp):
+                function = BINARY_OPERATORS.get(type(current.op))
+                if function is None or not is_small_operation(type(current.op), values[0], values[1]):
+                    continue
+            else:
+                function = UNARY_OPERATORS.get(type(current.op))
+                if function is None:
+                    continue
+            try:
+                results[current] = create_constant(function(*values), get_location(current))
+            except (ArithmeticError, TypeError, ValueError):
+                continue
+        return results[node]
 
 
 class ExpandString(ast.NodeTransformer):
+    def __init__(self, random_generator=random):
+        """
+        :param random_generator: The random number generator used to split the strings
+        """
+        self.random_generator = random_generator
+
     def visit_Constant(self, node):
         """
-        It looks for all strings and divide them.
+        It looks for all strings and divide them. The nodes of the addition are created directly, so the strings can
+        contain any character.
         :param node: A constant type node.
         :return: A BinOp node with a sum of the strings.
         """
         if isinstance(node.value, str) and len(node.value) > 1 and not node.value.startswith("__") and \
                 not node.value.endswith("__"):
+            location = get_location(node)
             substrings = self.split_string(node.value)
-            new_code = (chr(34) + chr(34) + chr(34) +
-                        (chr(34) + chr(34) + chr(34) + "+" + chr(34) + chr(34) + chr(34)).join(substrings) +
-                        chr(34) + chr(34) + chr(34))
-            new_code = new_code.replace("\\", "\\\\")
-            new_code = new_code.replace(chr(0), "\\x00")
-            new_code = new_code.replace(chr(9), "\\t")
-            new_code = new_code.replace(chr(10), "\\n")
-            new_node = ast.parse(new_code)
-            return new_node.body[0].value
+            new_node = ast.Constant(substrings[0], **location)
+            for substring in substrings[1:]:
+                new_node = ast.BinOp(new_node, ast.Add(), ast.Constant(substring, **location), **location)
+            return new_node
         return node
 
     def split_string(self, string_data):
@@ -57,175 +191,3009 @@ class ExpandString(ast.NodeTransformer):
         """
         substrings = []
         while len(string_data) > 0:
-            n = random.randint(1, len(string_data))
+            n = self.random_generator.randint(1, len(string_data))
             substrings.append(string_data[:n])
             string_data = string_data[n:]
         return substrings
 
 
-class RepairJoinedStr(ast.NodeTransformer):
-    def visit_JoinedStr(self, node: ast.JoinedStr):
+class ExpandInteger(ast.NodeTransformer):
+    def __init__(self, random_generator=random):
         """
-        It fixes the JoinedStr class.
-        :param node: A JoinedStr node.
-        :return: A JoinedStr node without BinOp.
+        :param random_generator: The random number generator used to create the expressions
         """
-        final_values = []
-        for value in node.values:
-            if isinstance(value, ast.BinOp):
-                binop_string = ast.unparse(value)
-                joined_string = eval(binop_string)
-                final_values.append(ast.Constant(joined_string))
+        self.random_generator = random_generator
+
+    def visit_Constant(self, node):
+        """
+        It looks for all integers and generates a math expression that returns the original integer.
+        :param node: A constant type node.
+        :return: A BinOp node with a math expression that when is valuated returns the original integer value.
+        """
+        if isinstance(node.value, int) and not isinstance(node.value, bool):
+            while True:
+                try:
+                    return self.get_expression(node.value, get_location(node))
+                except ZeroDivisionError:
+                    continue
+        return node
+
+    def get_expression(self, value, location):
+        """
+        It generates a math expression that has the same value as an integer. The nodes of the expression are created
+        and evaluated at the same time, with the same precedence and associativity that Python uses, so the expression
+        does not have to be parsed or evaluated with eval.
+        :param value: An integer.
+        :param location: A dictionary with the position of the integer in the code, that is copied to the new nodes
+        :return: A BinOp node with a math expression that has the same value as the integer.
+        """
+        # The numbers and the operators are drawn in two batches
+        count = self.random_generator.randint(2, 10)
+        numbers = self.random_generator.choices(range(1001), k=count)
+        symbols = self.random_generator.choices(list(ARITHMETIC_OPERATORS), k=count - 1)
+
+        # The terms of the additions and subtractions are built first, because the other operators take precedence
+        expression, result = None, 0
+        term, term_result = ast.Constant(numbers[0], **location), numbers[0]
+        addition = ast.Add
+        for number, symbol in zip(numbers[1:], symbols):
+            if symbol is ast.Add or symbol is ast.Sub:
+                expression, result = add_term(expression, result, addition, term, term_result, location)
+                term, term_result = ast.Constant(number, **location), number
+                addition = symbol
             else:
-                final_values.append(value)
-        node.values = final_values
+                term = ast.BinOp(term, symbol(), ast.Constant(number, **location), **location)
+                term_result = ARITHMETIC_OPERATORS[symbol](term_result, number)
+        expression, result = add_term(expression, result, addition, term, term_result, location)
+
+        # The difference with the integer is added at the end
+        last = result - value
+        if last > 0:
+            expression = ast.BinOp(expression, ast.Sub(), ast.Constant(last, **location), **location)
+        elif last < 0:
+            expression = ast.BinOp(expression, ast.Add(), ast.Constant(-last, **location), **location)
+        return expression
+
+
+class ExpandNodes(ast.NodeTransformer):
+    def __init__(self, transformations, random_generator=random, hot_lines=None):
+        """
+        It performs every enabled expansion and changes the pass locations walking a tree once.
+        :param transformations: A list with the names of the transformations to be performed
+        :param random_generator: The random number generator used by the transformations
+        :param hot_lines: A set with the first lines of the functions that are executed frequently, or None to add pass
+        statements everywhere. If it is not None, no pass statement is added in the loops and in those functions
+        """
+        self.reducer = ReduceBinOp() if "reduce" in transformations else None
+        self.string_expander = ExpandString(random_generator) if "strings" in transformations else None
+        self.integer_expander = ExpandInteger(random_generator) if "integers" in transformations else None
+        self.change_pass = "pass" in transformations
+        self.random_generator = random_generator
+
+        # Lines of the hot functions and number of hot nodes that contain the visited node. The expansions of the
+        # literals are folded by the compiler, so only the pass statements slow down the hot code
+        self.hot_lines = hot_lines
+        self.hot_depth = 0
+
+    def visit_Module(self, node):
+        """
+        It visits a whole tree and removes the pass added before the imports of __future__.
+        :param node: A Module node
+        :return: The modified node
+        """
+        node = self.generic_visit(node)
+        if self.change_pass:
+            fix_pass(node)
+        return node
+
+    def visit_BinOp(self, node):
+        """
+        It reduces a BinOp and expands the nodes inside it.
+        :param node: A BinOp node
+        :return: The modified node
+        """
+        if self.reducer is not None and node not in self.reducer.reduced:
+            node = self.reducer.reduce(node)
+            if not isinstance(node, ast.BinOp):
+                return self.visit(node)
+        return self.generic_visit(node)
+
+    def visit_Constant(self, node):
+        """
+        It expands the strings and the integers.
+        :param node: A Constant node
+        :return: The same node or a BinOp node with the same value
+        """
+        if self.string_expander is not None:
+            node = self.string_expander.visit_Constant(node)
+        if self.integer_expander is not None and isinstance(node, ast.Constant):
+            node = self.integer_expander.visit_Constant(node)
+        return node
+
+    def visit_JoinedStr(self, node):
+        """
+        It expands the formatted values of a JoinedStr. The strings of a JoinedStr cannot be expanded.
+        :param node: A JoinedStr node
+        :return: The same node
+        """
+        for value in node.values:
+            if isinstance(value, ast.FormattedValue):
+                self.visit(value)
+        return node
+
+    def visit_Assign(self, node):
+        """
+        It expands the value of an assignment, except the names exported by a module in __all__, which are changed
+        later with the other names.
+        :param node: An Assign or AugAssign node
+        :return: The modified node
+        """
+        targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+        if any(isinstance(target, ast.Name) and target.id == "__all__" for target in targets):
+            return node
+        return self.generic_visit(node)
+
+    visit_AugAssign = visit_Assign
+
+    def visit_match_case(self, node):
+        """
+        It expands the guard and the body of a case of a match statement. The patterns can only have literals, so they
+        are not expanded.
+        :param node: A match_case node
+        :return: The same node
+        """
+        if node.guard is not None:
+            node.guard = self.visit(node.guard)
+        node.body = [self.visit(statement) for statement in node.body]
+        if self.change_pass and not self.hot_depth:
+            node.body = change_pass_locations(node.body, self.random_generator)
+        return node
+
+    def generic_visit(self, node):
+        """
+        It visits the children of a node and changes the pass locations of its bodies, except in the hot code.
+        :param node: The node to visit
+        :return: The modified node
+        """
+        hot = self.hot_lines is not None and (self.hot_depth > 0 or self.is_hot(node))
+        self.hot_depth += hot
+        node = super().generic_visit(node)
+        self.hot_depth -= hot
+        if not self.change_pass or hot:
+            return node
+        if isinstance(node, ast.Module) or isinstance(node, ast.If) or isinstance(node, ast.For) or \
+                isinstance(node, ast.While) or isinstance(node, ast.Try) or isinstance(node, ast.AsyncFor) or \
+                isinstance(node, ast.FunctionDef) or isinstance(node, ast.ClassDef) or \
+                isinstance(node, ast.AsyncFunctionDef):
+            node.body = change_pass_locations(node.body, self.random_generator)
+        if isinstance(node, ast.If) or isinstance(node, ast.For) or isinstance(node, ast.While) or \
+                isinstance(node, ast.Try) or isinstance(node, ast.AsyncFor):
+            node.orelse = change_pass_locations(node.orelse, self.random_generator)
+        if isinstance(node, ast.Try):
+            node.finalbody = change_pass_locations(node.finalbody, self.random_generator)
+        return node
+
+    def is_hot(self, node):
+        """
+        It checks if a node is executed frequently. The loops are always hot, and the functions are hot if they contain
+        a hot line, so a hot comprehension or lambda makes its function hot.
+        :param node: A node
+        :return: True if the node is hot, otherwise False
+        """
+        if isinstance(node, ast.For) or isinstance(node, ast.AsyncFor) or isinstance(node, ast.While):
+            return True
+        if (isinstance(node, ast.FunctionDef) or isinstance(node, ast.AsyncFunctionDef)) and \
+                node.end_lineno is not None:
+            first_line = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+            return any(first_line <= line <= node.end_lineno for line in self.hot_lines)
+        return False
+
+
+class NameUpdater(ast.NodeVisitor):
+    def __init__(self, mapping, function_names, index):
+        """
+        It stores every old name and its new name so a tree can be renamed walking it once.
+        :param mapping: A NameMapping object with the new names
+        :param function_names: A list with the names of the functions
+        :param index: A SymbolIndex object with the modules imported between the abstract syntax trees
+        """
+        self.mapping = mapping
+        self.name_relations = mapping.name_relations
+        self.local_relations = mapping.local_relations
+        self.class_relations = mapping.class_relations
+        self.class_local_relations = mapping.class_local_relations
+        self.attribute_relations = mapping.attribute_relations
+        self.function_names = set(function_names)
+        self.index = index
+
+        # Names bound to the mutated modules, imports of the mutated modules and names exported by the module of the
+        # tree that is being visited
+        self.aliases = {}
+        self.imports = {}
+        self.exports = {}
+
+        # Names of the classes that are being visited and the names visible from the current scope
+        self.class_stack = []
+        self.scope = collections.ChainMap(self.name_relations)
+
+        # Names visible from the functions defined in the current scope. The names of a class body are not visible from
+        # its functions
+        self.enclosing_scope = self.scope
+
+    def rename(self, tree, file=None):
+        """
+        It changes the names of the tree of a file. The imports of the file are resolved with the symbol index.
+        :param tree: An abstract syntax tree
+        :param file: The file of the tree or None if it does not import the mutated modules
+        :return: The same tree
+        """
+        self.aliases = self.index.aliases.get(file, {})
+        self.imports = self.index.imports.get(file, {})
+        self.exports = self.index.exports.get(self.index.modules.get(file), {})
+        self.visit(tree)
+        return tree
+
+    def visit_ClassDef(self, node):
+        """
+        It changes the name of a class and the names bound in its body.
+        :param node: A ClassDef node
+        :return: The same node
+        """
+        class_name = node.name
+        relations = {}
+        if class_name in self.class_relations:
+            node.name = self.name_relations.get(class_name, class_name)
+            class_relations = self.class_relations[class_name]
+            relations = {name: class_relations[name] for name in self.mapping.class_body_names.get(class_name, ())
+                         if name in class_relations}
+
+        # Decorators, bases and keywords are evaluated outside the class
+        for part in node.decorator_list + node.bases + node.keywords:
+            self.visit(part)
+
+        outer_scope = self.scope
+        self.scope = collections.ChainMap(relations, *self.enclosing_scope.maps)
+        self.class_stack.append(class_name)
+        for part in node.body:
+            self.visit(part)
+        self.class_stack.pop()
+        self.scope = outer_scope
+        return node
+
+    def visit_FunctionDef(self, node):
+        """
+        It changes the name of a function, its arguments and its local variables.
+        :param node: A FunctionDef or AsyncFunctionDef node
+        :return: The same node
+        """
+        function_name = node.name
+        class_local_relations = {}
+        for class_name in reversed(self.class_stack):
+            relations = self.class_relations.get(class_name, {})
+            if function_name in relations:
+                node.name = relations[function_name]
+                class_local_relations = self.class_local_relations[class_name].get(function_name, {})
+                break
+            if function_name in self.class_local_relations.get(class_name, {}):
+                class_local_relations = self.class_local_relations[class_name][function_name]
+                break
+        else:
+            if function_name in self.function_names:
+                node.name = self.name_relations.get(function_name, function_name)
+
+        # Decorators, default values and annotations of the return are evaluated outside the function
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        for default in node.args.defaults + node.args.kw_defaults:
+            if default is not None:
+                self.visit(default)
+        if node.returns:
+            self.visit(node.returns)
+
+        outer_scope = self.scope
+        outer_enclosing_scope = self.enclosing_scope
+        self.scope = collections.ChainMap(class_local_relations, self.local_relations.get(function_name, {}),
+                                          *self.enclosing_scope.maps)
+        self.enclosing_scope = self.scope
+        for argument in node.args.posonlyargs + node.args.args + node.args.kwonlyargs + [node.args.vararg,
+                                                                                          node.args.kwarg]:
+            if argument is not None:
+                self.visit(argument)
+        for part in node.body:
+            self.visit(part)
+        self.scope = outer_scope
+        self.enclosing_scope = outer_enclosing_scope
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_arg(self, node):
+        """
+        It changes the name of an argument.
+        :param node: An arg node
+        :return: The same node
+        """
+        node.arg = self.scope.get(node.arg, node.arg)
+        self.generic_visit(node)
+        return node
+
+    def visit_Name(self, node):
+        """
+        It changes a name with the relation visible from the current scope.
+        :param node: A Name node
+        :return: The same node
+        """
+        node.id = self.scope.get(node.id, node.id)
+        return node
+
+    def visit_Global(self, node):
+        """
+        It changes the names declared as global or nonlocal.
+        :param node: A Global or Nonlocal node
+        :return: The same node
+        """
+        node.names = [self.scope.get(name, name) for name in node.names]
+        return node
+
+    visit_Nonlocal = visit_Global
+
+    def visit_ExceptHandler(self, node):
+        """
+        It changes the name of the exception of an except clause.
+        :param node: An ExceptHandler node
+        :return: The same node
+        """
+        if node.name is not None:
+            node.name = self.scope.get(node.name, node.name)
+        self.generic_visit(node)
+        return node
+
+    def visit_MatchAs(self, node):
+        """
+        It changes the name captured by a pattern.
+        :param node: A MatchAs or MatchStar node
+        :return: The same node
+        """
+        if node.name is not None:
+            node.name = self.scope.get(node.name, node.name)
+        self.generic_visit(node)
+        return node
+
+    visit_MatchStar = visit_MatchAs
+
+    def visit_MatchMapping(self, node):
+        """
+        It changes the name that captures the rest of a mapping pattern.
+        :param node: A MatchMapping node
+        :return: The same node
+        """
+        if node.rest is not None:
+            node.rest = self.scope.get(node.rest, node.rest)
+        self.generic_visit(node)
+        return node
+
+    def visit_MatchClass(self, node):
+        """
+        It changes the attributes of a class pattern.
+        :param node: A MatchClass node
+        :return: The same node
+        """
+        node.kwd_attrs = [self.attribute_relations.get(attribute, attribute) for attribute in node.kwd_attrs]
+        self.generic_visit(node)
+        return node
+
+    def visit_Attribute(self, node):
+        """
+        It changes the attributes of the classes and the attributes of the imported modules. The submodules keep their
+        names.
+        :param node: An Attribute node
+        :return: The same node
+        """
+        module = self.get_module(node.value) if self.aliases else None
+        if module is None:
+            node.attr = self.attribute_relations.get(node.attr, node.attr)
+        elif self.index.exports[module].get(node.attr) is None:
+            node.attr = self.name_relations.get(node.attr, node.attr)
+        self.generic_visit(node)
+        return node
+
+    def visit_ImportFrom(self, node):
+        """
+        It changes the names imported from the mutated modules. The submodules keep their names.
+        :param node: An ImportFrom node
+        :return: The same node
+        """
+        module = self.imports.get((node.level, node.module))
+        if module is not None:
+            exports = self.index.exports[module]
+            for alias in node.names:
+                if exports.get(alias.name) is None:
+                    alias.name = self.name_relations.get(alias.name, alias.name)
+        return node
+
+    def visit_Assign(self, node):
+        """
+        It changes the names exported by a module in __all__, so they can still be imported with a star import.
+        :param node: An Assign or AugAssign node
+        :return: The same node
+        """
+        targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+        if len(self.scope.maps) == 1 and (isinstance(node.value, ast.List) or isinstance(node.value, ast.Tuple)) and \
+                any(isinstance(target, ast.Name) and target.id == "__all__" for target in targets):
+            for element in node.value.elts:
+                if isinstance(element, ast.Constant) and isinstance(element.value, str) and \
+                        self.exports.get(element.value) is None:
+                    element.value = self.name_relations.get(element.value, element.value)
+        self.generic_visit(node)
         return node
 
+    visit_AugAssign = visit_Assign
+
+    def get_module(self, node):
+        """
+        It obtains the mutated module referenced by a name or by a chain of attributes, like "package.module".
+        :param node: An abstract syntax tree node
+        :return: The name of the module or None if the node does not reference a mutated module
+        """
+        if isinstance(node, ast.Name):
+            return self.aliases.get(node.id)
+        if isinstance(node, ast.Attribute):
+            module = self.get_module(node.value)
+            if module is not None:
+                return self.index.exports[module].get(node.attr)
+        return None
+
+    def get_fingerprint(self, identifiers, file=None):
+        """
+        It obtains a hash of the new names that can be used when a tree with some identifiers is changed. If two
+        NameUpdater objects have the same fingerprint for the identifiers of a tree, they change the tree in the same
+        way.
+        :param identifiers: A set with the identifiers of a tree
+        :param file: The file of the tree
+        :return: A string with the hash
+        """
+        def restrict(relations):
+            return sorted((old_name, new_name) for old_name, new_name in relations.items() if old_name in identifiers)
+
+        relations = []
+        for identifier in sorted(identifiers):
+            relations.append((
+                identifier,
+                self.name_relations.get(identifier),
+                self.attribute_relations.get(identifier),
+                identifier in self.function_names,
+                restrict(self.local_relations.get(identifier, {})),
+                restrict(self.class_relations.get(identifier, {})),
+                sorted(self.mapping.class_body_names.get(identifier, set()) & identifiers),
+                sorted((function, restrict(relations_of_function))
+                       for function, relations_of_function in self.class_local_relations.get(identifier, {}).items()
+                       if function in identifiers),
+            ))
+        relations.append(self.index.get_imported_symbols(file, identifiers))
+        return get_cache_key(relations)
+
+
+class NameScope:
+    """
+    It stores where the names bound in a part of the code are classified
+    """
+    def __init__(self, function_name="", data_class=None):
+        # Name of the function whose local variables are bound or an empty string outside the functions
+        self.function_name = function_name
+
+        # DataClass object of the class whose names are bound or None outside the classes
+        self.data_class = data_class
+
+        # Sets with the names declared as global and nonlocal in the function
+        self.global_names = set()
+        self.nonlocal_names = set()
+
+
+class NameAnalyser:
+    """
+    It classifies the names bound in an abstract syntax tree in global variables, functions, local variables and
+    classes. The tree is walked with a stack instead of recursive calls, so deeply nested code does not reach the
+    recursion limit, and every node is sent to the function of its type in a dispatch table.
+    """
+    def __init__(self, names):
+        # NameData object where the names are stored
+        self.names = names
+
+        # Dictionary with the types of the nodes that bind names as keys and the functions that analyse them as values.
+        # The children of the other nodes are analysed in the same scope
+        self.handlers = {
+            ast.FunctionDef: self.analyse_function,
+            ast.AsyncFunctionDef: self.analyse_function,
+            ast.ClassDef: self.analyse_class,
+            ast.Lambda: self.analyse_lambda,
+            ast.Assign: self.analyse_assign,
+            ast.AnnAssign: self.analyse_target,
+            ast.AugAssign: self.analyse_target,
+            ast.For: self.analyse_target,
+            ast.AsyncFor: self.analyse_target,
+            ast.NamedExpr: self.analyse_target,
+            ast.comprehension: self.analyse_target,
+            ast.withitem: self.analyse_with_item,
+            ast.ExceptHandler: self.analyse_except_handler,
+            ast.Global: self.analyse_global,
+            ast.Nonlocal: self.analyse_nonlocal,
+            ast.MatchAs: self.analyse_capture,
+            ast.MatchStar: self.analyse_capture,
+            ast.MatchMapping: self.analyse_mapping_pattern,
+            ast.Import: self.analyse_import,
+            ast.ImportFrom: self.analyse_import,
+            DataClass: self.add_class,
+        }
+        if hasattr(ast, "TypeAlias"):
+            self.handlers[ast.TypeAlias] = self.analyse_type_alias
+
+        # Set with the types of the nodes that cannot bind names and have no children that bind names
+        self.leaves = {ast.Name, ast.Constant}
+        for base in (ast.expr_context, ast.boolop, ast.operator, ast.unaryop, ast.cmpop):
+            self.leaves.update(base.__subclasses__())
+
+        # Stack of tuples with the nodes that will be analysed and their scopes
+        self.stack = []
+
+    def analyse(self, tree):
+        """
+        It classifies the names of a tree.
+        :param tree: An abstract syntax tree
+        :return: The NameData object with the names
+        """
+        self.stack.append((tree, NameScope()))
+        while self.stack:
+            node, scope = self.stack.pop()
+            handler = self.handlers.get(type(node))
+            if handler is None:
+                self.push_children(node, scope)
+            else:
+                handler(node, scope)
+        return self.names
+
+    def push(self, nodes, scope):
+        """
+        It adds nodes to the stack, so they are analysed in the same order.
+        :param nodes: A list of nodes. The elements that are None are ignored
+        :param scope: The NameScope object of the nodes
+        :return:
+        """
+        for node in reversed(nodes):
+            if node is not None:
+                self.stack.append((node, scope))
+
+    def push_children(self, node, scope):
+        """
+        It adds the children of a node to the stack, except the ones that cannot bind names.
+        :param node: A node
+        :param scope: The NameScope object of the children
+        :return:
+        """
+        # The fields and the lists are reversed, so the children are analysed in the same order
+        for field in reversed(node._fields):
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                for child in reversed(value):
+                    if isinstance(child, ast.AST) and type(child) not in self.leaves:
+                        self.stack.append((child, scope))
+            elif isinstance(value, ast.AST) and type(value) not in self.leaves:
+                self.stack.append((value, scope))
+
+    def bind(self, name, scope):
+        """
+        It stores a name bound in a scope.
+        :param name: The name
+        :param scope: The NameScope object where the name is bound
+        :return:
+        """
+        if name in scope.global_names:
+            self.bind_global(name)
+        elif name in scope.nonlocal_names:
+            return
+        elif scope.data_class is None and not scope.function_name:
+            self.bind_global(name)
+        elif scope.data_class is None:
+            self.names.local_variables.setdefault(scope.function_name, []).append(name)
+        elif not scope.function_name:
+            if not self.is_special_name(name):
+                scope.data_class.attributes.append(name)
+                scope.data_class.body_names.append(name)
+        elif name != "self":
+            scope.data_class.local_variables.setdefault(scope.function_name, []).append(name)
+
+    def bind_global(self, name):
+        """
+        It stores a global variable. The magic names of the modules, like __all__, keep their names.
+        :param name: The name
+        :return:
+        """
+        if not self.is_magic_name(name):
+            self.names.global_variables.append(name)
+
+    def bind_target(self, target, scope):
+        """
+        It stores the names bound by the target of an assignment, a loop, a with statement or a comprehension. The
+        attributes of "self" are stored as attributes of the class. The expressions inside the target are not analysed.
+        :param target: The node of the target
+        :param scope: The NameScope object where the names are bound
+        :return:
+        """
+        targets = [target]
+        while targets:
+            target = targets.pop()
+            if isinstance(target, ast.Name):
+                self.bind(target.id, scope)
+            elif isinstance(target, ast.Tuple) or isinstance(target, ast.List):
+                targets.extend(reversed(target.elts))
+            elif isinstance(target, ast.Starred):
+                targets.append(target.value)
+            elif isinstance(target, ast.Attribute) and scope.data_class is not None and \
+                    isinstance(target.value, ast.Name) and target.value.id == "self":
+                scope.data_class.attributes.append(target.attr)
+
+    def analyse_function(self, node, scope):
+        """
+        It stores the name of a function and analyses its arguments and its body in a new scope. The magic functions
+        of the modules and the magic methods and the visit_ methods of the classes keep their names.
+        :param node: A FunctionDef or AsyncFunctionDef node
+        :param scope: The NameScope object where the function is defined
+        :return:
+        """
+        if scope.data_class is None:
+            if scope.function_name or not self.is_magic_name(node.name):
+                self.names.function_names.append(node.name)
+        elif not self.is_special_name(node.name):
+            scope.data_class.functions.append(node.name)
+            if self.is_class_body(scope):
+                scope.data_class.body_names.append(node.name)
+
+        function_scope = NameScope(node.name, scope.data_class)
+        arguments = node.args
+        for argument in arguments.posonlyargs + arguments.args + arguments.kwonlyargs + [arguments.vararg,
+                                                                                         arguments.kwarg]:
+            if argument is not None:
+                self.bind(argument.arg, function_scope)
+        self.push(node.body, function_scope)
+
+        # Decorators, default values and annotations are evaluated outside the function
+        self.push(node.decorator_list + arguments.defaults + arguments.kw_defaults + [node.returns], scope)
+
+    def analyse_class(self, node, scope):
+        """
+        It creates the DataClass object of a class and analyses its body. The object is stored after the body.
+        :param node: A ClassDef node
+        :param scope: The NameScope object where the class is defined
+        :return:
+        """
+        data_class = DataClass()
+        data_class.class_name = node.name
+        self.stack.append((data_class, scope))
+        self.push(node.body, NameScope("", data_class))
+        self.push(node.decorator_list + node.bases + node.keywords, scope)
+
+    def add_class(self, data_class, scope):
+        """
+        It stores a class whose body was already analysed.
+        :param data_class: A DataClass object
+        :param scope: The NameScope object where the class is defined
+        :return:
+        """
+        self.names.classes.append(data_class)
+
+    def analyse_lambda(self, node, scope):
+        """
+        It analyses a lambda. Its arguments are not stored, because a lambda has no name to classify them, so they keep
+        their names or take the names of the enclosing scope.
+        :param node: A Lambda node
+        :param scope: The NameScope object where the lambda is defined
+        :return:
+        """
+        self.push(node.args.defaults + node.args.kw_defaults, scope)
+        if not self.is_class_body(scope):
+            self.push([node.body], scope)
+
+    def analyse_assign(self, node, scope):
+        """
+        It stores the names bound by an assignment with several targets.
+        :param node: An Assign node
+        :param scope: The NameScope object of the assignment
+        :return:
+        """
+        for target in node.targets:
+            self.bind_target(target, scope)
+        self.push_children(node, scope)
+
+    def analyse_target(self, node, scope):
+        """
+        It stores the names bound by the target of a node and analyses the rest of the node. The names bound by an
+        assignment expression or by a comprehension in the body of a class are not stored.
+        :param node: An AnnAssign, AugAssign, For, AsyncFor, NamedExpr or comprehension node
+        :param scope: The NameScope object of the node
+        :return:
+        """
+        if not self.is_class_body(scope) or not (isinstance(node, ast.NamedExpr) or
+                                                 isinstance(node, ast.comprehension)):
+            self.bind_target(node.target, scope)
+        self.push_children(node, scope)
+
+    def analyse_with_item(self, node, scope):
+        """
+        It stores the names bound by an item of a with statement.
+        :param node: A withitem node
+        :param scope: The NameScope object of the with statement
+        :return:
+        """
+        if node.optional_vars is not None:
+            self.bind_target(node.optional_vars, scope)
+        self.push_children(node, scope)
+
+    def analyse_except_handler(self, node, scope):
+        """
+        It stores the name of the exception of an except clause.
+        :param node: An ExceptHandler node
+        :param scope: The NameScope object of the except clause
+        :return:
+        """
+        if node.name is not None:
+            self.bind(node.name, scope)
+        self.push_children(node, scope)
+
+    def analyse_global(self, node, scope):
+        """
+        It stores the names declared as global, so they are bound as global variables in the function.
+        :param node: A Global node
+        :param scope: The NameScope object of the function
+        :return:
+        """
+        scope.global_names.update(node.names)
+        scope.nonlocal_names.difference_update(node.names)
+
+    def analyse_nonlocal(self, node, scope):
+        """
+        It stores the names declared as nonlocal, so they are not bound in the function.
+        :param node: A Nonlocal node
+        :param scope: The NameScope object of the function
+        :return:
+        """
+        scope.nonlocal_names.update(node.names)
+        scope.global_names.difference_update(node.names)
+
+    def analyse_capture(self, node, scope):
+        """
+        It stores the name captured by a pattern of a match statement.
+        :param node: A MatchAs or MatchStar node
+        :param scope: The NameScope object of the match statement
+        :return:
+        """
+        if node.name is not None:
+            self.bind(node.name, scope)
+        self.push_children(node, scope)
+
+    def analyse_mapping_pattern(self, node, scope):
+        """
+        It stores the name that captures the rest of a mapping pattern.
+        :param node: A MatchMapping node
+        :param scope: The NameScope object of the match statement
+        :return:
+        """
+        if node.rest is not None:
+            self.bind(node.rest, scope)
+        self.push_children(node, scope)
+
+    def analyse_import(self, node, scope):
+        """
+        It ignores the imports. The imported names are not changed.
+        :param node: An Import or ImportFrom node
+        :param scope: The NameScope object of the import
+        :return:
+        """
+        return
+
+    def analyse_type_alias(self, node, scope):
+        """
+        It stores the name of a type alias.
+        :param node: A TypeAlias node
+        :param scope: The NameScope object of the type alias
+        :return:
+        """
+        self.bind_target(node.name, scope)
+        self.push_children(node, scope)
+
+    @staticmethod
+    def is_special_name(name):
+        """
+        It checks if a name of a class is used by Python or by the classes of the ast module, like the magic methods and
+        the visit_ methods.
+        :param name: A function or attribute name of a class
+        :return: True if the name cannot be changed, otherwise False
+        """
+        return NameAnalyser.is_magic_name(name) or name.startswith("visit_")
+
+    @staticmethod
+    def is_magic_name(name):
+        """
+        It checks if a name is a magic name used by Python, like __init__ or __all__.
+        :param name: A name
+        :return: True if the name starts and ends with two underscores, otherwise False
+        """
+        return name.startswith("__") and name.endswith("__")
+
+    @staticmethod
+    def is_class_body(scope):
+        """
+        It checks if a scope is the body of a class.
+        :param scope: A NameScope object
+        :return: True if the names are bound as attributes of a class, otherwise False
+        """
+        return scope.data_class is not None and not scope.function_name
+
+
+class DataClass:
+    """
+    It stores the relevant names of a class
+    """
+    def __init__(self):
+        # Name of the class
+        self.class_name = ""
+
+        # List of attributes
+        self.attributes = []
+
+        # List of the functions
+        self.functions = []
+
+        # List of the functions and attributes bound in the body of the class, which are visible from the body
+        self.body_names = []
+
+        # Dictionary that stores every local variable in each function
+        self.local_variables = {}
+
+        # Dictionary with the old names of the variables of the class as keys and the new generated names as values
+        self.name_relations = {}
+
+        # Dictionary with the functions as keys and the relations of the names of its local variables as values
+        self.local_relations = {}
+
+
+class NameData:
+    """
+    It stores the relevant names of the mutated code
+    """
+    def __init__(self):
+        # List of the global variables
+        self.global_variables = []
+
+        # List of the functions
+        self.function_names = []
+
+        # Dictionary that stores every local variable in each function
+        self.local_variables = {}
+
+        # List of DataClass objects with the names of every class
+        self.classes = []
+
+
+class NameMapping:
+    """
+    It stores the new names of a mutation, so they can be reused in other mutations
+    """
+    def __init__(self):
+        # Dictionary with the old names of the global variables, functions and classes as keys and the new names as
+        # values
+        self.name_relations = {}
+
+        # Dictionary with the functions as keys and the relations of the names of its local variables as values
+        self.local_relations = {}
+
+        # Dictionary with the classes as keys and the relations of the names of its attributes and functions as values
+        self.class_relations = {}
+
+        # Dictionary with the classes as keys and the relations of the local variables of its functions as values
+        self.class_local_relations = {}
+
+        # Dictionary with the relations of the attributes of every class. If two classes share an attribute, the first
+        # one has priority
+        self.attribute_relations = {}
+
+        # Dictionary with the classes as keys and a set with the names bound in their bodies as values
+        self.class_body_names = {}
+
+    def get_new_names(self):
+        """
+        It obtains every new name stored in the mapping.
+        :return: A set with the new names
+        """
+        new_names = set(self.name_relations.values())
+        new_names.update(self.attribute_relations.values())
+        for relations in self.local_relations.values():
+            new_names.update(relations.values())
+        for relations in self.class_relations.values():
+            new_names.update(relations.values())
+        for class_local_relations in self.class_local_relations.values():
+            for relations in class_local_relations.values():
+                new_names.update(relations.values())
+        return new_names
+
+
+class ModuleSymbols:
+    """
+    It stores the names bound at the top level of a module and its imports
+    """
+    def __init__(self):
+        # Set with the variables, functions and classes defined at the top level of the module
+        self.definitions = set()
+
+        # List of tuples (level, module, name, alias, top level) with the imports of the module. The name is None when a
+        # whole module is imported with an import statement
+        self.imports = []
+
+
+class SymbolIndex:
+    """
+    It stores the modules of the mutated files, the names exported by every module and the mutated module imported by
+    every import, so the imports between the files are resolved with lookups when the names are changed
+    """
+    def __init__(self):
+        # Dictionary with the files as keys and the names of their modules as values
+        self.modules = {}
+
+        # Dictionary with the files as keys and the packages used to resolve their relative imports as values
+        self.packages = {}
+
+        # Dictionary with the files as keys and their ModuleSymbols objects as values
+        self.symbols = {}
+
+        # Dictionary with the mutated modules and their packages as keys and dictionaries with the names bound at their
+        # top level as values. Every name is bound to the mutated module that it references or to None
+        self.exports = {}
+
+        # Dictionary with the files as keys and dictionaries with the names bound to mutated modules as values
+        self.aliases = {}
+
+        # Dictionary with the files as keys and dictionaries with the level and the module of every ImportFrom node as
+        # keys and the mutated module that it imports as values
+        self.imports = {}
+
+    def add_module(self, file, symbols):
+        """
+        It stores a mutated file and registers its module as a submodule of its packages.
+        :param file: The file
+        :param symbols: A ModuleSymbols object with the names of the file
+        :return:
+        """
+        module = get_module_name(file)
+        self.modules[file] = module
+        self.symbols[file] = symbols
+        if pathlib.PurePath(file).stem == "__init__":
+            self.packages[file] = module
+        else:
+            self.packages[file] = module.rpartition(".")[0]
+
+        parts = module.split(".")
+        for i in range(1, len(parts) + 1):
+            self.exports.setdefault(".".join(parts[:i]), {})
+            if i > 1:
+                self.exports[".".join(parts[:i - 1])][parts[i - 1]] = ".".join(parts[:i])
+
+    def resolve(self):
+        """
+        It resolves the imports of every file once every file is stored. The names imported at the top level of a
+        module are exported by the module, so the re-exports of the __init__.py files are followed.
+        :return:
+        """
+        for file, symbols in self.symbols.items():
+            exports = self.exports[self.modules[file]]
+            for name in symbols.definitions:
+                exports.setdefault(name, None)
+
+        # The re-exports can depend on other re-exports, so the imports are resolved until nothing changes
+        for _ in range(len(self.symbols) + 1):
+            changed = False
+            for file, symbols in self.symbols.items():
+                exports = self.exports[self.modules[file]]
+                for level, module, name, alias, top_level in symbols.imports:
+                    if not top_level:
+                        continue
+                    for bound_name, target in self.get_bindings(file, level, module, name, alias):
+                        if target is None:
+                            exports.setdefault(bound_name, None)
+                        elif exports.get(bound_name) != target:
+                            exports[bound_name] = target
+                            changed = True
+            if not changed:
+                break
+
+        for file, symbols in self.symbols.items():
+            aliases = self.aliases[file] = {}
+            imports = self.imports[file] = {}
+            for level, module, name, alias, top_level in symbols.imports:
+                for bound_name, target in self.get_bindings(file, level, module, name, alias):
+                    if target is not None:
+                        aliases[bound_name] = target
+                if name is not None:
+                    source = self.resolve_import(file, level, module)
+                    if source in self.exports:
+                        imports[(level, module)] = source
+
+    def get_bindings(self, file, level, module, name, alias):
+        """
+        It obtains the names bound by an import and the mutated modules that they reference.
+        :param file: The file of the import
+        :param level: The level of the import. It is 0 in the absolute imports
+        :param module: The imported module or None in the imports like "from . import name"
+        :param name: The name imported from the module, "*" or None if the whole module is imported
+        :param alias: The name given to the imported module or name or None
+        :return: A list of tuples with the bound names and the modules or None if they are not mutated modules
+        """
+        source = self.resolve_import(file, level, module)
+        if name is None:
+            if alias is not None:
+                return [(alias, source if source in self.exports else None)]
+            root = source.partition(".")[0]
+            return [(root, root if root in self.exports else None)]
+        exports = self.exports.get(source, {})
+        if name == "*":
+            return [(exported, target) for exported, target in exports.items() if not exported.startswith("_")]
+        return [(alias or name, exports.get(name))]
+
+    def resolve_import(self, file, level, module):
+        """
+        It obtains the absolute name of an imported module.
+        :param file: The file of the import
+        :param level: The level of the import. It is 0 in the absolute imports
+        :param module: The imported module or None in the imports like "from . import name"
+        :return: The absolute name of the module or None if a relative import goes beyond the top package
+        """
+        if level == 0:
+            return module
+        parts = self.packages[file].split(".") if self.packages[file] else []
+        if level - 1 > len(parts):
+            return None
+        parts = parts[:len(parts) - level + 1]
+        if module:
+            parts.append(module)
+        return ".".join(parts) or None
+
+    def get_imported_symbols(self, file, identifiers):
+        """
+        It obtains the mutated modules imported by a file and the modules that they export with some identifiers. If
+        they do not change, the imports of the file are changed in the same way.
+        :param file: The file
+        :param identifiers: A set with the identifiers of the tree of the file
+        :return: A list with the modules and the names
+        """
+        aliases = self.aliases.get(file, {})
+        imports = self.imports.get(file, {})
+        modules = set(aliases.values()) | set(imports.values())
+        pending = list(modules)
+        exported = []
+        while pending:
+            module = pending.pop()
+            for name, target in self.exports[module].items():
+                if name in identifiers and target is not None:
+                    exported.append((module, name, target))
+                    if target not in modules:
+                        modules.add(target)
+                        pending.append(target)
+        return [self.modules.get(file), sorted(aliases.items()), sorted(imports.items(), key=str), sorted(exported)]
+
+
+class NameGenerator:
+    """
+    It generates random names that are never repeated and are different from a set of excluded names
+    """
+    def __init__(self, exclusions=(), random_generator=random, style="letters", min_len=5, max_len=15):
+        # Set with the names that cannot be generated or reused
+        self.exclusions = set(exclusions)
+        self.exclusions.update(keyword.kwlist)
+        self.exclusions.update(keyword.softkwlist)
+        self.exclusions.update(dir(builtins))
+
+        # Set with the names that were already generated
+        self.generated = set()
+
+        # Random number generator used to create the names
+        self.random_generator = random_generator
+
+        # Style of the names. It is a key of NAME_STYLES
+        self.style = style
+
+        # Minimum and maximum length of the names
+        self.min_len = min_len
+        self.max_len = max_len
+
+    def generate(self):
+        """
+        It creates a new name and adds it to the exclusions.
+        :return: A random string
+        """
+        for _ in range(1000):
+            new_name = get_random_name(self.min_len, self.max_len, self.random_generator, self.style)
+            if new_name not in self.exclusions and new_name not in self.generated:
+                self.generated.add(new_name)
+                return new_name
+        raise ValueError("there are not enough " + self.style + " names with a length between " + str(self.min_len) +
+                         " and " + str(self.max_len))
+
+    def reserve(self, new_names):
+        """
+        It stores names generated in other mutations, so they are not generated again.
+        :param new_names: An iterable with the names
+        :return:
+        """
+        self.generated.update(new_names)
+
+    def reuse(self, new_name):
+        """
+        It returns a name generated in other mutation if it does not collide with the names of the code.
+        :param new_name: The name generated in other mutation or None
+        :return: The same name or a new one
+        """
+        if new_name is None or new_name in self.exclusions:
+            return self.generate()
+        self.generated.add(new_name)
+        return new_name
+
+
+class Profile:
+    """
+    It stores the wall time, the peak memory and the amount of processed elements of every stage of a mutation
+    """
+    def __init__(self, enabled=True):
+        # If it is False, the stages are not measured
+        self.enabled = enabled
+
+        # List of dictionaries with the measures of every stage of every file. The stages of all the files have no file
+        self.records = []
+
+        # Time when the mutation started and wall time of the whole mutation
+        self.start = time.perf_counter()
+        self.seconds = None
+
+    @contextlib.contextmanager
+    def measure(self, stage, file=None, unit="nodes"):
+        """
+        It measures the stage performed inside the with statement. The amount of processed elements can be stored in
+        the "count" key of the returned record.
+        :param stage: The name of the stage
+        :param file: The file processed in the stage or None if the stage processes all the files
+        :param unit: The name of the elements counted in the stage
+        :return: A dictionary with the measures of the stage
+        """
+        record = {"stage": stage, "file": file, "unit": unit, "seconds": 0.0, "peak_memory": 0, "count": 0}
+        if not self.enabled:
+            yield record
+            return
+
+        # The memory is traced only while a stage is measured, because tracing slows down the program
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start()
+        memory = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            record["peak_memory"] = max(0, tracemalloc.get_traced_memory()[1] - memory)
+            if not tracing:
+                tracemalloc.stop()
+            self.records.append(record)
+
+    def finish(self):
+        """
+        It stores the wall time of the mutation.
+        :return:
+        """
+        self.seconds = time.perf_counter() - self.start
+
+    def get_report(self):
+        """
+        It adds up the measures of every stage and of every file.
+        :return: A dictionary with the wall time of the mutation, a list with the measures of every stage and a list
+        with the measures of every file
+        """
+        stages = {}
+        files = {}
+        for record in self.records:
+            stage = stages.setdefault(record["stage"], {"stage": record["stage"], "unit": record["unit"],
+                                                        "seconds": 0.0, "peak_memory": 0, "count": 0, "files": 0})
+            stage["seconds"] += record["seconds"]
+            stage["peak_memory"] = max(stage["peak_memory"], record["peak_memory"])
+            stage["count"] += record["count"]
+            if record["file"] is None:
+                continue
+            stage["files"] += 1
+            file = files.setdefault(record["file"], {"file": record["file"], "seconds": 0.0, "peak_memory": 0,
+                                                     "stages": {}})
+            file["seconds"] += record["seconds"]
+            file["peak_memory"] = max(file["peak_memory"], record["peak_memory"])
+            file["stages"][record["stage"]] = {key: record[key] for key in ("seconds", "peak_memory", "count")}
+        return {"seconds": self.seconds, "stages": list(stages.values()), "files": list(files.values())}
+
+    def get_summary(self, slowest=5):
+        """
+        It creates a readable summary of the measures.
+        :param slowest: Number of the slowest files that are shown
+        :return: A string with the summary
+        """
+        report = self.get_report()
+        lines = ["{:<12} {:>10} {:>14} {:>12} {:<6} {:>6}".format("stage", "seconds", "peak memory", "count", "unit",
+                                                                   "files")]
+        for stage in report["stages"]:
+            lines.append("{:<12} {:>10.4f} {:>14} {:>12} {:<6} {:>6}".format(
+                stage["stage"], stage["seconds"], format_bytes(stage["peak_memory"]), stage["count"], stage["unit"],
+                stage["files"]))
+        if report["seconds"] is not None:
+            lines.append("{:<12} {:>10.4f}".format("wall time", report["seconds"]))
+        if report["files"]:
+            lines.append("")
+            lines.append("{:<40} {:>10} {:>14}".format("slowest files", "seconds", "peak memory"))
+            for file in sorted(report["files"], key=lambda file: file["seconds"], reverse=True)[:slowest]:
+                lines.append("{:<40} {:>10.4f} {:>14}".format(file["file"], file["seconds"],
+                                                             format_bytes(file["peak_memory"])))
+        return chr(10).join(lines)
+
+
+class Mutator:
+    """
+    It mutates python code. The names found in the code are stored in a new NameData object in every mutation, so the
+    same Mutator can be used several times and from several threads.
+    """
+    def __init__(self, transformations=TRANSFORMATIONS, seed=None, jobs=1, name_style="letters", name_length=(5, 15),
+                 cache=None, profile=False, stream=False, hot_functions=None, bytecode=False, shard_lines=None,
+                 mapping_file=None, duplicates="share"):
+        # List with the names of the transformations of the nodes to be performed
+        self.transformations = list(transformations)
+
+        # Seed of the random generators or None to obtain a different result in every mutation
+        self.seed = seed
+
+        # Number of processes used to mutate the code
+        self.jobs = jobs
+
+        # Style of the generated names. It is a key of NAME_STYLES
+        self.name_style = name_style
+
+        # Minimum and maximum length of the generated names
+        self.name_length = tuple(name_length)
+
+        # Directory of the cache of the mutated files or None to not use a cache
+        self.cache = cache
+
+        # If it is True, every stage of the mutations is measured
+        self.profile = profile
+
+        # If it is True, the files are read twice so only one tree of every process is kept in memory
+        self.stream = stream
+
+        # Dictionary with the files of a profile and the sets of first lines of their hot functions, or None to add pass
+        # statements in the hot code. If it is empty, only the loops are protected
+        self.hot_functions = hot_functions
+
+        # If it is True, the mutated trees are compiled and saved as pyc files instead of generating their source code.
+        # It is not used with the cache
+        self.bytecode = bytecode
+
+        # Approximate number of lines of the shards of the big modules, which are mutated in parallel, or None to mutate
+        # every module in one process. It is not used with the cache, the streaming mode, the variants or the bytecode
+        self.shard_lines = shard_lines
+
+        # JSON file with the new names and the modules of the previous mutations, which are reused and updated in every
+        # mutation, or None to generate every name again. It is not used with the cache or the variants
+        self.mapping_file = mapping_file
+
+        # How the files with the same content are mutated. They are always analysed once, and they receive the same code
+        # with "share" or their own random changes with "distinct". It is not used with the cache or the variants
+        self.duplicates = duplicates
+
+        # Profile object with the measures of the last mutation or None if the mutations are not measured
+        self.last_profile = None
+
+        raise_recursion_limit()
+
+    def get_hot_lines(self, file):
+        """
+        It obtains the first lines of the hot functions of a file. The files of the profile are matched by the end of
+        their paths, so a profile recorded in another directory can be used.
+        :param file: A file with source code
+        :return: A set with the first lines of the hot functions or None if the hot code is not protected
+        """
+        if self.hot_functions is None:
+            return None
+        parts = pathlib.PurePath(file).parts
+        lines = set()
+        for profiled_file, profiled_lines in self.hot_functions.items():
+            profiled_parts = pathlib.PurePath(profiled_file).parts
+            length = min(len(parts), len(profiled_parts))
+            if parts[len(parts) - length:] == profiled_parts[len(profiled_parts) - length:]:
+                lines.update(profiled_lines)
+        return lines
+
+    def mutate_source(self, code, file="source.py"):
+        """
+        It mutates the code of one module in memory.
+        :param code: A string with source code or an abstract syntax tree. The tree is modified
+        :param file: The name of the file of the code
+        :return: The mutated source code
+        """
+        return self.mutate([code], [file])[0]
+
+    def mutate(self, codes, files=None):
+        """
+        It mutates the code of several modules in memory.
+        :param codes: A list with strings of source code or abstract syntax trees. The trees are modified
+        :param files: A list with the names of the files of the codes. They are used to find the modules imported
+        between the codes and to create the random generators. By default, the codes are named as "0.py", "1.py"...
+        :return: A list with the mutated source code
+        """
+        if files is None:
+            files = [str(i) + ".py" for i in range(len(codes))]
+        return self.run(files, codes, None)
+
+    def mutate_files(self, files):
+        """
+        It mutates python files and saves them in the results directory.
+        :param files: A list of files with source code
+        :return: A list with the mutated source code, or None if the files are streamed. If the files are saved as
+        bytecode, the elements of the list are None
+        """
+        create_final_directory(files)
+        if self.cache is not None:
+            return self.mutate_cached_files(files)
+        if self.stream:
+            return self.mutate_streamed_files(files)
+        return self.run(files, [None] * len(files), RESULTS_DIRECTORY, self.bytecode)
+
+    def mutate_archive(self, archive, directory=RESULTS_DIRECTORY):
+        """
+        It mutates the python files of a zip or tar archive, like a wheel or a source distribution, and saves a new
+        archive with the same name in the results directory. The other members are copied without changes.
+        :param archive: The path of the archive
+        :param directory: The directory where the mutated archive is saved
+        :return: The path of the mutated archive
+        """
+        members, codes = read_archive(archive)
+        sources = self.run(get_archive_modules(members), codes, None)
+        pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
+        output = os.path.join(directory, os.path.basename(archive))
+        save_archive(archive, output, dict(zip(members, sources)))
+        return output
+
+    def mutate_streamed_files(self, files):
+        """
+        It mutates python files in two passes, so the memory does not grow with the number of files. The first pass
+        only obtains the names and the imports of every file. The second pass reads every file again, mutates it and
+        saves it, and its tree and its code are freed before the next file. The files with the same content are grouped
+        like without streaming, so the result is the same.
+        :param files: A list of files with source code
+        :return: None, because the mutated source code is not kept
+        """
+        profile = self.create_profile()
+        with create_executor(self.jobs) as executor:
+            # The files with the same content are scanned once
+            with profile.measure("duplicates", unit="files") as record:
+                groups = group_duplicates(files, [None] * len(files))
+                record["count"] = len(files) - len(groups)
+
+            # Obtain the information about the variable names without keeping the trees
+            scans = self.map_stage(executor, profile, scan_file, [files[group[0]] for group in groups])
+            with profile.measure("names", unit="names") as record:
+                names = NameData()
+                symbols = [None] * len(files)
+                for group, (file_names, group_symbols) in zip(groups, scans):
+                    merge_names(names, file_names)
+                    for i in group:
+                        symbols[i] = group_symbols
+                exclusions = get_exclusions(names)
+                previous, modules, index = self.load_mapping(files, symbols)
+                record["count"] = len(exclusions)
+            del scans
+
+            # Generate the new names
+            with profile.measure("generate", unit="names") as record:
+                name_updater = self.create_name_updater(names, exclusions, index, previous)
+                record["count"] = len(name_updater.mapping.get_new_names())
+
+            # Read, mutate and save every file. The shared duplicates are mutated once for every different way of
+            # resolving their imports, with the random changes of the first file of their group
+            if self.duplicates == "share":
+                units = [(members, group[0]) for group in groups
+                         for members in group_import_contexts(group, files, index)]
+            else:
+                units = [([i], i) for i in range(len(files))]
+            self.map_stage(executor, profile, mutate_file, [files[members[0]] for members, _ in units],
+                           [self.transformations] * len(units), [name_updater] * len(units), [self.seed] * len(units),
+                           [self.get_hot_lines(files[i]) for _, i in units], [RESULTS_DIRECTORY] * len(units),
+                           [self.bytecode] * len(units), [files[i] for _, i in units])
+
+        # The duplicates receive the saved code of the first file of their group
+        for members, _ in units:
+            if len(members) > 1:
+                copy_mutated_file(files[members[0]], [files[i] for i in members[1:]], None, RESULTS_DIRECTORY,
+                                  self.bytecode)
+        self.save_mapping(name_updater.mapping, modules)
+        profile.finish()
+
+    def mutate_cached_files(self, files):
+        """
+        It mutates python files and saves them in the results directory, reusing the mutations stored in the cache. A
+        file is only mutated again if its content changed or if the new names of the identifiers that it uses changed,
+        like the names imported from a changed file. The new names of the previous mutation are reused.
+        :param files: A list of files with source code
+        :return: A list with the mutated source code
+        """
+        profile = self.create_profile()
+        cache = pathlib.Path(self.cache)
+        cache.mkdir(parents=True, exist_ok=True)
+        version = get_tool_version()
+
+        # Every file is stored with the hash of its content and the options of the mutation
+        keys = []
+        digests = []
+        for file in files:
+            with open(file, "rb") as f:
+                digests.append(hashlib.sha256(f.read()).hexdigest())
+            hot_lines = self.get_hot_lines(file)
+            keys.append(get_cache_key(version, file, digests[-1], self.seed, self.transformations,
+                                      None if hot_lines is None else sorted(hot_lines)))
+        entries = [load_cache(cache / (key + ".pickle")) for key in keys]
+        mapping_file = cache / ("mapping-" + get_cache_key(version, self.seed, self.name_style, self.name_length) +
+                                ".pickle")
+
+        with create_executor(self.jobs) as executor:
+            # Analyse the files that are not in the cache
+            trees = {}
+            changed = [i for i in range(len(files)) if entries[i] is None]
+            analysis = self.map_stage(executor, profile, analyse_file, [files[i] for i in changed],
+                                      [self.transformations] * len(changed), [self.seed] * len(changed),
+                                      [self.get_hot_lines(files[i]) for i in changed])
+            for i, (tree, file_names, identifiers, symbols) in zip(changed, analysis):
+                trees[i] = tree
+                entries[i] = {"names": pickle.dumps(file_names), "identifiers": identifiers, "symbols": symbols}
+
+            # Get the information about the variable names of every file. The names of the files with the same content
+            # are only added once, like without the cache
+            with profile.measure("names", unit="names") as record:
+                names = NameData()
+                for entry in dict(zip(digests, entries)).values():
+                    merge_names(names, pickle.loads(entry["names"]))
+                exclusions = get_exclusions(names)
+                index = create_symbol_index(files, [entry["symbols"] for entry in entries])
+                record["count"] = len(exclusions)
+
+            # Generate the new names reusing the names of the previous mutation
+            with profile.measure("generate", unit="names") as record:
+                name_updater = create_name_updater(names, self.create_name_generator(exclusions, self.seed), index,
+                                                   load_cache(mapping_file))
+                record["count"] = len(name_updater.mapping.get_new_names())
+
+            # The files that changed and the files whose names changed are mutated
+            fingerprints = [name_updater.get_fingerprint(entry["identifiers"], file)
+                            for file, entry in zip(files, entries)]
+            outdated = [i for i in range(len(files)) if i in trees or entries[i]["fingerprint"] != fingerprints[i]]
+            unparsed = [i for i in outdated if i not in trees]
+            unparsed_trees = self.map_stage(executor, profile, prepare_tree, [files[i] for i in unparsed],
+                                            [None] * len(unparsed), [self.transformations] * len(unparsed),
+                                            [self.seed] * len(unparsed),
+                                            [self.get_hot_lines(files[i]) for i in unparsed])
+            trees.update(zip(unparsed, unparsed_trees))
+            sources = self.map_stage(executor, profile, finish_tree, [files[i] for i in outdated],
+                                     [trees[i] for i in outdated], [name_updater] * len(outdated),
+                                     [self.seed] * len(outdated), [RESULTS_DIRECTORY] * len(outdated))
+
+        # Store the new mutations and restore the files that were not mutated
+        for i, source in zip(outdated, sources):
+            entries[i]["fingerprint"] = fingerprints[i]
+            entries[i]["source"] = source
+            save_cache(cache / (keys[i] + ".pickle"), entries[i])
+        for i in set(range(len(files))) - set(outdated):
+            restore_source_code(files[i], entries[i]["source"])
+        save_cache(mapping_file, name_updater.mapping)
+        profile.finish()
+        return [entry["source"] for entry in entries]
+
+    def mutate_variants(self, files, variants):
+        """
+        It creates several mutations of python files reading and analysing the files once. Every variant is saved in its
+        own directory inside the results directory (variant_0000, variant_0001...).
+        :param files: A list of files with source code
+        :param variants: Number of mutations of every file
+        :return:
+        """
+        # Only the reduction of the nodes does not depend on the random generators, so it is performed once
+        reduction = [transformation for transformation in self.transformations if transformation == "reduce"]
+
+        with create_executor(self.jobs) as executor:
+            # Obtain the abstract syntax trees and the information about the variable names
+            trees = map_files(executor, self.jobs, prepare_tree, files, [None] * len(files),
+                              [reduction] * len(files), [self.seed] * len(files))
+            names = NameData()
+            exclusions = manage_names(trees, names)
+            index = create_symbol_index(files, [get_module_symbols(tree) for tree in trees])
+
+            # Every variant mutates its own copy of the analysis
+            analysis = pickle.dumps((trees, names, exclusions, index))
+            map_files(executor, self.jobs, mutate_variant, list(range(variants)), [analysis] * variants,
+                      [files] * variants, [self] * variants)
+
+    def run(self, files, codes, directory, bytecode=False):
+        """
+        It performs every stage of the mutation.
+        :param files: A list with the names of the files
+        :param codes: A list with the source code or the trees of the files. If an element is None, the file is read
+        :param directory: The directory where the mutated code is saved or None to not save it
+        :param bytecode: If it is True, the trees are compiled and saved as pyc files instead of generating their code
+        :return: A list with the mutated source code or a list of None if the trees are compiled
+        """
+        profile = self.create_profile()
+
+        # The stages of every file are performed in a pool of processes and the names are managed in this process
+        with create_executor(self.jobs) as executor:
+            # The files with the same content are analysed once. If the duplicates are shared, they are mutated once too
+            with profile.measure("duplicates", unit="files") as record:
+                groups = group_duplicates(files, codes)
+                record["count"] = len(files) - len(groups)
+            if self.duplicates == "share":
+                prepared = [group[0] for group in groups]
+            else:
+                prepared = list(range(len(files)))
+
+            # Obtain a list of the abstract syntax trees with the modifications in their nodes
+            prepared_files = [files[i] for i in prepared]
+            prepared_codes = [codes[i] for i in prepared]
+            shards = None
+            if self.shard_lines is not None and not bytecode:
+                trees, shards = self.prepare_shards(executor, profile, prepared_files, prepared_codes)
+                shards = dict(zip(prepared, shards))
+            else:
+                trees = self.map_stage(executor, profile, prepare_tree, prepared_files, prepared_codes,
+                                       [self.transformations] * len(prepared), [self.seed] * len(prepared),
+                                       [self.get_hot_lines(file) for file in prepared_files])
+            trees = dict(zip(prepared, trees))
+
+            # Get the information about the variable names
+            with profile.measure("names", unit="names") as record:
+                names = NameData()
+                exclusions = manage_names([trees[group[0]] for group in groups], names)
+                symbols = [None] * len(files)
+                for group in groups:
+                    group_symbols = get_module_symbols(trees[group[0]])
+                    for i in group:
+                        symbols[i] = group_symbols
+                previous, modules, index = self.load_mapping(files, symbols)
+                record["count"] = len(exclusions)
+
+            # Generate the new names
+            with profile.measure("generate", unit="names") as record:
+                name_updater = self.create_name_updater(names, exclusions, index, previous)
+                record["count"] = len(name_updater.mapping.get_new_names())
+
+            # Change the names and generate the final code of every tree. The shared duplicates are mutated once for
+            # every different way of resolving their imports
+            if self.duplicates == "share":
+                units = []
+                for group in groups:
+                    for j, members in enumerate(group_import_contexts(group, files, index)):
+                        units.append((members, trees[group[0]] if j == 0 else copy.deepcopy(trees[group[0]]),
+                                      group[0]))
+            else:
+                units = [([i], trees[i], i) for i in range(len(files))]
+            unit_files = [files[members[0]] for members, _, _ in units]
+            unit_trees = [tree for _, tree, _ in units]
+            if shards is not None:
+                unit_sources = self.finish_shards(executor, profile, unit_files, unit_trees,
+                                                  [shards[i] for _, _, i in units], name_updater, directory)
+            else:
+                unit_sources = self.map_stage(executor, profile, finish_tree, unit_files, unit_trees,
+                                              [name_updater] * len(units), [self.seed] * len(units),
+                                              [directory] * len(units), [bytecode] * len(units))
+
+        # The duplicates receive the code of the first file of their group
+        sources = [None] * len(files)
+        for (members, _, _), source in zip(units, unit_sources):
+            for i in members:
+                sources[i] = source
+            if directory is not None and len(members) > 1:
+                copy_mutated_file(files[members[0]], [files[i] for i in members[1:]], source, directory, bytecode)
+        self.save_mapping(name_updater.mapping, modules)
+        profile.finish()
+        return sources
+
+    def load_mapping(self, files, symbols):
+        """
+        It reads the mapping file and creates the symbol index of the mutated files and of the modules stored in the
+        mapping file. These modules are not mutated again, but the mutated files can still import them.
+        :param files: A list with the names of the mutated files
+        :param symbols: A list with the ModuleSymbols objects of the mutated files
+        :return: A tuple with the NameMapping object of the previous mutations or None, a dictionary with the files and
+        the ModuleSymbols objects of every module and the SymbolIndex object
+        """
+        previous = None
+        modules = {}
+        if self.mapping_file is not None:
+            previous, modules = load_name_mapping(self.mapping_file)
+        modules.update(zip(files, symbols))
+        return previous, modules, create_symbol_index(list(modules), list(modules.values()))
+
+    def create_name_updater(self, names, exclusions, index, previous=None):
+        """
+        It generates the new names of a mutation. The new names of the previous mutations are reused and kept, so the
+        names imported from the modules that are not mutated again are changed in the same way.
+        :param names: The NameData object with the names of the code
+        :param exclusions: A set with the names of the code
+        :param index: A SymbolIndex object with the modules imported between the files
+        :param previous: A NameMapping object with the names of the previous mutations or None
+        :return: A NameUpdater object
+        """
+        name_updater = create_name_updater(names, self.create_name_generator(exclusions, self.seed), index, previous)
+        if previous is not None:
+            extend_name_mapping(name_updater.mapping, previous)
+        return name_updater
+
+    def save_mapping(self, mapping, modules):
+        """
+        It saves the new names and the modules of a mutation in the mapping file, if the mutator has one.
+        :param mapping: The NameMapping object of the mutation
+        :param modules: A dictionary with the files and the ModuleSymbols objects of every module
+        :return:
+        """
+        if self.mapping_file is not None:
+            save_name_mapping(self.mapping_file, mapping, modules)
+
+    def prepare_shards(self, executor, profile, files, codes):
+        """
+        It splits the big modules in shards and modifies the nodes of every shard in parallel. The shards of a module
+        are joined again, so the names of the whole module are analysed once.
+        :param executor: A pool of processes or None to modify the shards in this process
+        :param profile: The Profile object of the mutation
+        :param files: A list with the names of the files
+        :param codes: A list with the source code or the trees of the files. If an element is None, the file is read
+        :return: A tuple with a list of the modified trees of the files and a list with the number of top-level
+        statements of every shard of every file
+        """
+        codes = self.map_stage(executor, profile, split_module, files, codes, [self.shard_lines] * len(files))
+
+        # The modules that are not split keep the random generators that they have without shards
+        units = [(i, j if len(shard_codes) > 1 else None) for i, shard_codes in enumerate(codes)
+                 for j in range(len(shard_codes))]
+        shard_trees = self.map_stage(executor, profile, prepare_tree, [files[i] for i, _ in units],
+                                     [codes[i][j or 0] for i, j in units], [self.transformations] * len(units),
+                                     [self.seed] * len(units), [self.get_hot_lines(files[i]) for i, _ in units],
+                                     [j for _, j in units])
+        trees = [ast.Module(body=[], type_ignores=[]) for _ in files]
+        shards = [[] for _ in files]
+        for (i, _), tree in zip(units, shard_trees):
+            trees[i].body.extend(tree.body)
+            trees[i].type_ignores.extend(tree.type_ignores)
+            shards[i].append(len(tree.body))
+        return trees, shards
+
+    def finish_shards(self, executor, profile, files, trees, shards, name_updater, directory):
+        """
+        It splits the trees in the same shards where their nodes were modified, generates the code of every shard in
+        parallel and joins the code of the shards of every file.
+        :param executor: A pool of processes or None to generate the code in this process
+        :param profile: The Profile object of the mutation
+        :param files: A list with the names of the files
+        :param trees: A list with the trees of the files
+        :param shards: A list with the number of top-level statements of every shard of every file
+        :param name_updater: A NameUpdater object with the new names
+        :param directory: The directory where the mutated code is saved or None to not save it
+        :return: A list with the mutated source code
+        """
+        units = []
+        shard_trees = []
+        for i, (tree, lengths) in enumerate(zip(trees, shards)):
+            start = 0
+            for j, length in enumerate(lengths):
+                units.append((i, j if len(lengths) > 1 else None))
+                shard_trees.append(ast.Module(body=tree.body[start:start + length],
+                                              type_ignores=tree.type_ignores if j == 0 else []))
+                start += length
+        shard_sources = self.map_stage(executor, profile, finish_tree, [files[i] for i, _ in units], shard_trees,
+                                       [name_updater] * len(units), [self.seed] * len(units), [None] * len(units),
+                                       [False] * len(units), [j for _, j in units])
+        sources = [[] for _ in files]
+        for (i, _), source in zip(units, shard_sources):
+            sources[i].append(source)
+        sources = [chr(10).join(file_sources) for file_sources in sources]
+
+        # Saves the final code
+        if directory is not None:
+            for file, source in zip(files, sources):
+                with profile.measure("save", file, "bytes") as record:
+                    save_source_code([file], [source], directory)
+                    record["count"] = len(source)
+        return sources
+
+    def create_profile(self):
+        """
+        It creates the Profile object of a mutation and stores it as the profile of the last mutation.
+        :return: A Profile object, that does not measure anything if the mutations are not measured
+        """
+        if not self.profile:
+            return Profile(False)
+        self.last_profile = Profile()
+        return self.last_profile
+
+    def map_stage(self, executor, profile, function, files, *arguments):
+        """
+        It applies a stage to every file keeping the order of the files. The measures of the stage are added to the
+        profile, even if the stage is performed in other process.
+        :param executor: A pool of processes or None to apply the stage in this process
+        :param profile: The Profile object of the mutation
+        :param function: The function of the stage. It receives a file, the elements of the arguments in the same
+        position and a Profile object in the keyword argument profile
+        :param files: A list of files
+        :param arguments: Lists with the other arguments of the function
+        :return: A list with the results of the function
+        """
+        if not profile.enabled:
+            return map_files(executor, self.jobs, function, files, *arguments)
+        results = map_files(executor, self.jobs, profile_stage, [function] * len(files), files, *arguments)
+        for _, records in results:
+            profile.records.extend(records)
+        return [result for result, _ in results]
+
+    def create_name_generator(self, exclusions, seed):
+        """
+        It creates the NameGenerator object that generates the new names of a mutation.
+        :param exclusions: A set with the names of the code
+        :param seed: The seed of the mutation
+        :return: A NameGenerator object
+        """
+        return NameGenerator(exclusions, get_random_generator(seed, "names"), self.name_style, *self.name_length)
+
+
+class MutationServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """
+    It mutates the source code received in a Unix domain socket. Every request and every response is a JSON object in
+    a line. The code is mutated in a pool of processes that is kept between the requests, so the requests do not pay the
+    startup of Python
+    """
+    address_family = getattr(socket, "AF_UNIX", None)
+    daemon_threads = True
+
+    def __init__(self, path, mutator, jobs=1, history=10000):
+        # Mutator object with the default options of the requests
+        self.mutator = mutator
+
+        # Number of processes of the pool and the pool that mutates the code
+        self.jobs = jobs
+        self.executor = concurrent.futures.ProcessPoolExecutor(jobs, initializer=raise_recursion_limit)
+
+        # Latencies in seconds of the last requests, number of requests and failed requests, and the lock that
+        # protects them
+        self.latencies = collections.deque(maxlen=history)
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        super().__init__(path, MutationHandler)
+
+    def warm_up(self):
+        """
+        It starts the processes of the pool and imports this program in them before the first request.
+        :return:
+        """
+        list(self.executor.map(mutate_request, [{"source": "pass"}] * self.jobs, [self.mutator] * self.jobs))
+
+    def process(self, line):
+        """
+        It answers a request.
+        :param line: The bytes of a line with a request encoded as JSON
+        :return: A dictionary with the response
+        """
+        start = time.perf_counter()
+        request = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("the request must be a JSON object")
+            if request.get("command") == "stats":
+                return self.get_stats()
+            if request.get("command") == "shutdown":
+                threading.Thread(target=self.shutdown).start()
+                return {"status": "stopping"}
+            response = self.executor.submit(mutate_request, request, self.mutator).result()
+        except concurrent.futures.process.BrokenProcessPool:
+            # A process of the pool died, so the pool is replaced for the next requests
+            with self.lock:
+                self.executor.shutdown(wait=False)
+                self.executor = concurrent.futures.ProcessPoolExecutor(self.jobs, initializer=raise_recursion_limit)
+            response = {"error": "the process that mutated the code died"}
+        except Exception as e:
+            response = {"error": type(e).__name__ + ": " + str(e)}
+        latency = time.perf_counter() - start
+
+        with self.lock:
+            self.requests += 1
+            self.latencies.append(latency)
+            if "error" in response:
+                self.errors += 1
+        if isinstance(request, dict) and "id" in request:
+            response["id"] = request["id"]
+        response["seconds"] = latency
+        return response
+
+    def get_stats(self):
+        """
+        It obtains the metrics of the latency of the requests.
+        :return: A dictionary with the number of requests and failed requests and the mean, the percentiles and the
+        maximum of the latencies of the last requests in seconds
+        """
+        with self.lock:
+            latencies = sorted(self.latencies)
+            stats = {"requests": self.requests, "errors": self.errors}
+        if latencies:
+            stats["latency"] = {
+                "mean": sum(latencies) / len(latencies),
+                "p50": latencies[(len(latencies) - 1) // 2],
+                "p90": latencies[(len(latencies) - 1) * 9 // 10],
+                "p99": latencies[(len(latencies) - 1) * 99 // 100],
+                "max": latencies[-1],
+            }
+        return stats
+
+    def server_close(self):
+        """
+        It closes the socket, removes its file and stops the pool of processes.
+        :return:
+        """
+        super().server_close()
+        self.executor.shutdown()
+        with contextlib.suppress(OSError):
+            os.unlink(self.server_address)
+
+
+class MutationHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        """
+        It answers the requests of a connection in order until the connection is closed.
+        :return:
+        """
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.process(line)
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class BatchWriter:
+    """
+    It writes the responses of the records of a batch to a stream as soon as they are finished, in the order of the
+    records or in the order in which they finish
+    """
+    def __init__(self, stream, ordered=False):
+        # Stream where the responses are written as JSON lines
+        self.stream = stream
+
+        # If it is True, the responses are written in the order of the records
+        self.ordered = ordered
+
+        # Dictionary with the numbers of the records as keys and their finished responses that were not written yet as
+        # values
+        self.finished = {}
+
+        # Number of records, number of written responses and the condition that protects them
+        self.records = 0
+        self.written = 0
+        self.condition = threading.Condition()
+
+    def add(self, future):
+        """
+        It registers a record. Its response is written when the future is finished.
+        :param future: A Future object whose result is the response of the record
+        :return:
+        """
+        with self.condition:
+            number = self.records
+            self.records += 1
+        future.add_done_callback(functools.partial(self.finish, number))
+
+    def finish(self, number, future):
+        """
+        It writes the response of a finished record and the responses of the following records that were waiting for it.
+        :param number: The number of the record
+        :param future: The finished Future object of the record
+        :return:
+        """
+        try:
+            response = future.result()
+        except Exception as e:
+            response = {"error": type(e).__name__ + ": " + str(e)}
+        with self.condition:
+            self.finished[number] = response
+            while self.finished:
+                if self.ordered:
+                    if self.written not in self.finished:
+                        break
+                    response = self.finished.pop(self.written)
+                else:
+                    response = self.finished.pop(next(iter(self.finished)))
+                self.stream.write(json.dumps(response) + chr(10))
+                self.written += 1
+            self.stream.flush()
+            self.condition.notify_all()
+
+    def wait(self, limit=0):
+        """
+        It waits until the number of records whose responses are not written is not greater than a limit.
+        :param limit: The maximum number of pending records
+        :return:
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.records - self.written <= limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mutates the code of python files",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "file",
+        metavar='File(s)',
+        type=str,
+        help="File(s) to be mutated. The python files of the zip and tar archives, like wheels and source "
+             "distributions, are mutated in a new archive",
+        nargs="*"
+    )
+    parser.add_argument(
+        "--disable",
+        choices=TRANSFORMATIONS,
+        action="append",
+        default=None,
+        help="Transformation of the nodes that will not be performed. It can be used several times"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes used to mutate the files"
+    )
+    parser.add_argument(
+        "--variants",
+        type=int,
+        default=0,
+        help="Number of different mutations of the files. Every variant is saved in results/variant_XXXX"
+    )
+    parser.add_argument(
+        "--name-style",
+        choices=list(NAME_STYLES),
+        default="letters",
+        help="Style of the generated names"
+    )
+    parser.add_argument(
+        "--name-length",
+        metavar=("MIN", "MAX"),
+        type=int,
+        nargs=2,
+        default=[5, 15],
+        help="Minimum and maximum length of the generated names"
+    )
+    parser.add_argument(
+        "--cache",
+        metavar="DIRECTORY",
+        default=None,
+        help="Directory of the cache of the mutations. The files that did not change since the last mutation are not "
+             "mutated again"
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="REPORT",
+        default=None,
+        help="JSON file where the wall time, the peak memory and the processed nodes or names of every stage and every "
+             "file are saved. A summary is shown in the standard error. It does not work with --variants"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read the files twice, first to obtain their names and then to mutate them one by one, so the memory does "
+             "not grow with the number of files. It does not work with --cache or --variants"
+    )
+    parser.add_argument(
+        "--bytecode",
+        action="store_true",
+        help="Compile the mutated trees and save them as pyc files, which are imported without their source code, "
+             "instead of generating the mutated source code. It does not work with --cache or the archives"
+    )
+    parser.add_argument(
+        "--shard-lines",
+        metavar="LINES",
+        type=int,
+        default=None,
+        help="Split the modules with more lines in shards of about LINES lines, cut between their top-level "
+             "statements, so the nodes of a big module are modified and its code is generated in several processes. It "
+             "does not work with --cache, --stream, --variants or --bytecode"
+    )
+    parser.add_argument(
+        "--mapping",
+        metavar="FILE",
+        default=None,
+        help="JSON file with the new names of the previous mutations. The names are reused, the new ones are added to "
+             "the file and the modules stored in it can be imported by the mutated files without mutating them again. "
+             "It does not work with --cache, --variants, --serve or --batch"
+    )
+    parser.add_argument(
+        "--duplicates",
+        choices=["share", "distinct"],
+        default="share",
+        help="How the files with the same content are mutated. They are always analysed once, and they receive the "
+             "same mutated code with share or their own random changes with distinct. It is not used with --cache "
+             "or --variants"
+    )
+    parser.add_argument(
+        "--hot-code",
+        action="store_true",
+        help="Do not add pass statements inside the loops, so the mutated code is not slower. The expansions of the "
+             "literals are kept, because they are computed when the code is compiled"
+    )
+    parser.add_argument(
+        "--hot-profile",
+        metavar="PROFILE",
+        default=None,
+        help="File saved by cProfile or profile. The functions that spend at least " + str(HOT_TIME_SHARE * 100) +
+             "%% of the time are also protected like the loops. It implies --hot-code"
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="SOCKET",
+        default=None,
+        help="Path of a Unix domain socket where a server receives code and returns it mutated, instead of mutating "
+             "files. The processes of --jobs are kept between the requests and the other options are the default "
+             "options of the requests"
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Read JSON lines with code from the standard input and write the mutated code to the standard output as "
+             "JSON lines, instead of mutating files. Every line has the same fields as a request of --serve"
+    )
+    parser.add_argument(
+        "--ordered",
+        action="store_true",
+        help="Write the results of --batch in the order of the lines instead of as soon as they are finished"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed of the random generators. The same seed and files always produce the same result"
+    )
+    args = parser.parse_args()
+    if not args.file and args.serve is None and not args.batch:
+        parser.error("the following arguments are required: File(s)")
+    if args.file and (args.serve is not None or args.batch):
+        parser.error("the files cannot be mutated with --serve or --batch")
+    if args.serve is not None and args.batch:
+        parser.error("--serve and --batch cannot be used together")
+    if args.ordered and not args.batch:
+        parser.error("--ordered only works with --batch")
+    archives = [file for file in args.file if get_archive_format(file) is not None]
+    files = [file for file in args.file if get_archive_format(file) is None]
+    if archives and (args.variants or args.cache is not None or args.stream or args.bytecode):
+        parser.error("the archives cannot be mutated with --variants, --cache, --stream or --bytecode")
+    if args.stream and (args.cache is not None or args.variants):
+        parser.error("--stream does not work with --cache or --variants")
+    if args.profile is not None and args.variants:
+        parser.error("--profile does not work with --variants")
+    if args.bytecode and (args.cache is not None or args.serve is not None or args.batch):
+        parser.error("--bytecode does not work with --cache, --serve or --batch")
+    if args.shard_lines is not None and (args.cache is not None or args.stream or args.variants or args.bytecode):
+        parser.error("--shard-lines does not work with --cache, --stream, --variants or --bytecode")
+    if args.shard_lines is not None and args.shard_lines < 1:
+        parser.error("the number of lines of the shards must be greater than 0")
+    if args.mapping is not None and (args.cache is not None or args.variants or args.serve is not None or args.batch):
+        parser.error("--mapping does not work with --cache, --variants, --serve or --batch")
+    if args.jobs < 1:
+        parser.error("the number of jobs must be greater than 0")
+    if args.variants < 0:
+        parser.error("the number of variants cannot be negative")
+    if not 0 < args.name_length[0] <= args.name_length[1]:
+        parser.error("the length of the names must be greater than 0 and MIN cannot be greater than MAX")
+
+    disabled = args.disable or []
+    transformations = [transformation for transformation in TRANSFORMATIONS if transformation not in disabled]
+    hot_functions = None
+    if args.hot_profile is not None:
+        hot_functions = load_hot_functions(args.hot_profile)
+    elif args.hot_code:
+        hot_functions = {}
+    mutator = Mutator(transformations, args.seed, args.jobs, args.name_style, args.name_length, args.cache,
+                      args.profile is not None, args.stream, hot_functions, args.bytecode, args.shard_lines,
+                      args.mapping, args.duplicates)
+    if args.serve is not None:
+        serve(args.serve, mutator, args.jobs)
+    elif args.batch:
+        mutate_batch(mutator, args.jobs, args.ordered)
+    elif args.variants:
+        mutator.mutate_variants(args.file, args.variants)
+    else:
+        if files:
+            mutator.mutate_files(files)
+        for archive in archives:
+            mutator.mutate_archive(archive)
+
+    if mutator.last_profile is not None:
+        with open(args.profile, "w") as f:
+            json.dump(mutator.last_profile.get_report(), f, indent=4)
+        print(mutator.last_profile.get_summary(), file=sys.stderr)
+
+
+def mutate(files, transformations=TRANSFORMATIONS, jobs=1, seed=None):
+    """
+    It reads a python source code file and mutates the code.
+    :param files: A list of files with source code
+    :param transformations: A list with the names of the transformations of the nodes to be performed
+    :param jobs: Number of processes used to mutate the files
+    :param seed: The seed of the random generators or None to obtain a different result in every execution
+    :return:
+    """
+    Mutator(transformations, seed, jobs).mutate_files(files)
+
+
+def serve(path, mutator, jobs=1):
+    """
+    It mutates the code received in a Unix domain socket until the server receives the shutdown command or it is
+    interrupted.
+    :param path: The path of the socket. A socket left by a server that is not running is replaced
+    :param mutator: The Mutator object with the default options of the requests
+    :param jobs: Number of processes used to mutate the code
+    :return:
+    """
+    if MutationServer.address_family is None:
+        raise OSError("the Unix domain sockets are not supported in this platform")
+    if os.path.exists(path):
+        with socket.socket(socket.AF_UNIX) as client:
+            try:
+                client.connect(path)
+            except ConnectionRefusedError:
+                os.unlink(path)
+            else:
+                raise OSError("there is a server listening in " + path)
+
+    with MutationServer(path, mutator, jobs) as server:
+        server.warm_up()
+        print("Listening in " + path, file=sys.stderr)
+        with contextlib.suppress(KeyboardInterrupt):
+            server.serve_forever()
+
+
+def mutate_batch(mutator, jobs=1, ordered=False, input_stream=None, output_stream=None):
+    """
+    It mutates the code of the records read from a stream and writes the responses to other stream as they finish.
+    Every record is a request of mutate_request encoded as JSON in a line and every response is written in a line with
+    the id of its record. Only a few records are read in advance, so the batch can be a pipe that never ends.
+    :param mutator: The Mutator object with the default options of the records
+    :param jobs: Number of processes used to mutate the records
+    :param ordered: If it is True, the responses are written in the order of the records, otherwise in the order in
+    which they finish
+    :param input_stream: The stream of the records or None to read the standard input
+    :param output_stream: The stream of the responses or None to write in the standard output
+    :return:
+    """
+    input_stream = sys.stdin if input_stream is None else input_stream
+    writer = BatchWriter(sys.stdout if output_stream is None else output_stream, ordered)
+    with create_executor(jobs) as executor:
+        for line in input_stream:
+            if not line.strip():
+                continue
+            if executor is None:
+                future = concurrent.futures.Future()
+                future.set_result(answer_record(line, mutator))
+            else:
+                writer.wait(jobs * 4)
+                future = executor.submit(answer_record, line, mutator)
+            writer.add(future)
+        writer.wait()
+
+
+def answer_record(line, mutator):
+    """
+    It mutates the code of a record of a batch.
+    :param line: A line with a request of mutate_request encoded as JSON
+    :param mutator: The Mutator object with the default options of the record
+    :return: A dictionary with the response of mutate_request or with the error of the record, and the id of the record
+    """
+    request = None
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("the record must be a JSON object")
+        response = mutate_request(request, mutator)
+    except Exception as e:
+        response = {"error": type(e).__name__ + ": " + str(e)}
+    if isinstance(request, dict) and "id" in request:
+        response["id"] = request["id"]
+    return response
+
+
+def mutate_request(request, mutator):
+    """
+    It mutates the code of a request of the server.
+    :param request: A dictionary with the source code in "source" or a list of source codes in "sources". The names of
+    the files can be given in "file" or in "files", with one name for every source, and the options "seed", "disable",
+    "name_style", "name_length" and "hot_code" replace the options of the mutator
+    :param mutator: The Mutator object with the default options
+    :return: A dictionary with the mutated source code in "source" or a list of mutated source codes in "sources"
+    """
+    transformations = mutator.transformations
+    if "disable" in request:
+        unknown = set(request["disable"]) - set(TRANSFORMATIONS)
+        if unknown:
+            raise ValueError("unknown transformations: " + ", ".join(sorted(unknown)))
+        transformations = [transformation for transformation in TRANSFORMATIONS
+                           if transformation not in request["disable"]]
+    name_style = request.get("name_style", mutator.name_style)
+    if name_style not in NAME_STYLES:
+        raise ValueError("unknown name style: " + str(name_style))
+    min_len, max_len = request.get("name_length", mutator.name_length)
+    if not 0 < min_len <= max_len:
+        raise ValueError("the length of the names must be greater than 0 and the minimum cannot be greater than the "
+                         "maximum")
+    hot_functions = mutator.hot_functions
+    if "hot_code" in request:
+        hot_functions = (hot_functions or {}) if request["hot_code"] else None
+    mutator = Mutator(transformations, request.get("seed", mutator.seed), 1, name_style, (min_len, max_len),
+                      hot_functions=hot_functions)
+
+    if isinstance(request.get("sources"), list):
+        files = request.get("files")
+        if files is not None and (not isinstance(files, list) or len(files) != len(request["sources"])):
+            raise ValueError("the files must be a list with the name of every source")
+        return {"sources": mutator.mutate(request["sources"], files)}
+    if isinstance(request.get("source"), str):
+        return {"source": mutator.mutate_source(request["source"], request.get("file", "source.py"))}
+    raise ValueError("the request must have a source or a list of sources")
+
+
+def raise_recursion_limit():
+    """
+    It raises the recursion limit of the process to RECURSION_LIMIT, so the deep trees can be mutated. A higher limit is
+    never lowered.
+    :return:
+    """
+    if sys.getrecursionlimit() < RECURSION_LIMIT:
+        sys.setrecursionlimit(RECURSION_LIMIT)
+
+
+@contextlib.contextmanager
+def create_executor(jobs):
+    """
+    It creates the pool of processes of a mutation and shuts it down when the mutation finishes.
+    :param jobs: Number of processes
+    :return: A context manager with the pool of processes or None if only one process is used
+    """
+    if jobs <= 1:
+        yield None
+        return
+    executor = concurrent.futures.ProcessPoolExecutor(jobs, initializer=raise_recursion_limit)
+    try:
+        yield executor
+    finally:
+        executor.shutdown()
+
+
+def map_files(executor, jobs, function, files, *arguments):
+    """
+    It applies a function to every file keeping the order of the files.
+    :param executor: A pool of processes or None to apply the function in this process
+    :param jobs: Number of processes of the pool
+    :param function: The function to apply. It receives a file and the elements of the arguments in the same position
+    :param files: A list of files
+    :param arguments: Lists with the other arguments of the function
+    :return: A list with the results of the function
+    """
+    if executor is None:
+        return list(map(function, files, *arguments))
+    chunk_size = max(1, len(files) // (jobs * 4))
+    return list(executor.map(function, files, *arguments, chunksize=chunk_size))
+
+
+def group_duplicates(files, codes):
+    """
+    It groups the files with the same content. The trees given instead of the code are never grouped.
+    :param files: A list with the names of the files
+    :param codes: A list with the source code or the trees of the files. If an element is None, the file is read
+    :return: A list with the lists of the positions of the files with the same content, in the order of the files
+    """
+    groups = {}
+    for i, (file, code) in enumerate(zip(files, codes)):
+        if code is None:
+            with open(file, "rb") as f:
+                key = hashlib.sha256(f.read()).hexdigest()
+        elif isinstance(code, str):
+            key = hashlib.sha256(code.encode("utf-8", "surrogatepass")).hexdigest()
+        else:
+            key = i
+        groups.setdefault(key, []).append(i)
+    return list(groups.values())
+
+
+def group_import_contexts(group, files, index):
+    """
+    It splits a group of files with the same content by the way their imports are resolved, because the same relative
+    import can reference different modules. The files of every new group are renamed in the same way.
+    :param group: A list with the positions of some files with the same content
+    :param files: A list with the names of the files
+    :param index: A SymbolIndex object with the modules of the files
+    :return: A list with the lists of the positions of the files whose imports are resolved in the same way
+    """
+    contexts = []
+    for i in group:
+        context = (index.aliases.get(files[i], {}), index.imports.get(files[i], {}),
+                   index.exports.get(index.modules.get(files[i]), {}))
+        for other_context, members in contexts:
+            if other_context == context:
+                members.append(i)
+                break
+        else:
+            contexts.append((context, [i]))
+    return [members for _, members in contexts]
+
+
+def get_random_generator(seed, *keys):
+    """
+    It creates the random number generator of a stage. Every stage of every file has an independent generator, so the
+    result does not depend on the order in which the files are mutated.
+    :param seed: The seed of the mutation or None to obtain a different generator in every execution
+    :param keys: Values that identify the stage, like its name and the file
+    :return: A random.Random object
+    """
+    if seed is None:
+        return random.Random()
+    return random.Random(chr(0).join([str(seed)] + [str(key) for key in keys]))
+
+
+def get_module_name(file):
+    """
+    It obtains the name of the module of a file. The absolute paths are made relative to the working directory and the
+    __init__.py files are named as their packages.
+    :param file: A file
+    :return: A string with the name of the module, like "package.module"
+    """
+    path = os.path.normpath(file)
+    if os.path.isabs(path):
+        try:
+            path = os.path.relpath(path)
+        except ValueError:
+            pass
+    path = pathlib.PurePath(path)
+    parts = [part for part in path.with_suffix("").parts if part != path.anchor and part != os.pardir]
+    if parts and parts[-1] == "__init__" and len(parts) > 1:
+        parts.pop()
+    return ".".join(parts)
+
+
+def get_module_symbols(tree):
+    """
+    It obtains the names defined at the top level of a tree and every import of the tree. Only the statements are
+    walked, because the expressions cannot import modules.
+    :param tree: An abstract syntax tree
+    :return: A ModuleSymbols object
+    """
+    symbols = ModuleSymbols()
+    statements = [(statement, True) for statement in reversed(tree.body)]
+    while statements:
+        statement, top_level = statements.pop()
+        if isinstance(statement, ast.Import):
+            for alias in statement.names:
+                symbols.imports.append((0, alias.name, None, alias.asname, top_level))
+        elif isinstance(statement, ast.ImportFrom):
+            for alias in statement.names:
+                symbols.imports.append((statement.level, statement.module, alias.name, alias.asname, top_level))
+        elif top_level and (isinstance(statement, ast.FunctionDef) or isinstance(statement, ast.AsyncFunctionDef) or
+                            isinstance(statement, ast.ClassDef)):
+            symbols.definitions.add(statement.name)
+        elif top_level and (isinstance(statement, ast.Assign) or isinstance(statement, ast.AnnAssign) or
+                            isinstance(statement, ast.AugAssign)):
+            targets = statement.targets if isinstance(statement, ast.Assign) else [statement.target]
+            for target in targets:
+                for node in ast.walk(target):
+                    if isinstance(node, ast.Name):
+                        symbols.definitions.add(node.id)
+
+        # The functions and the classes do not export their imports
+        inner = not (isinstance(statement, ast.FunctionDef) or isinstance(statement, ast.AsyncFunctionDef) or
+                     isinstance(statement, ast.ClassDef))
+        children = []
+        for field in ("body", "orelse", "finalbody", "handlers", "cases"):
+            for child in getattr(statement, field, []):
+                children.append((child, top_level and inner))
+        statements.extend(reversed(children))
+    return symbols
+
+
+def create_symbol_index(files, symbols):
+    """
+    It creates the index of the modules of the mutated files.
+    :param files: A list of files
+    :param symbols: A list with the ModuleSymbols objects of the files
+    :return: A SymbolIndex object
+    """
+    index = SymbolIndex()
+    for file, file_symbols in zip(files, symbols):
+        index.add_module(file, file_symbols)
+    index.resolve()
+    return index
 
-class ExpandInteger(ast.NodeTransformer):
-    def visit_Constant(self, node):
-        """
-        It looks for all integers and generates a math expression that returns the original integer.
-        :param node: A constant type node.
-        :return: A BinOp node with a math expression that when is valuated returns the original integer value.
-        """
-        if isinstance(node.value, int) and not isinstance(node.value, bool):
-            code = ""
-            while True:
-                try:
-                    code = self.get_expression(node.value)
-                    break
-                except ZeroDivisionError:
-                    continue
-            new_node = ast.parse(code)
-            return new_node.body[0].value
-        return node
 
-    def get_expression(self, value):
-        """
-        It generates a math expression that has the same value as an integer.
-        :param value: An integer.
-        :return: Math expression that has the same value as an integer.
-        """
-        random_numbers = [str(random.randint(0, 1000)) for _ in range(random.randint(2, 10))]
-        symbols = ["+", "-", "*", "%", "//"]
-        operation = []
-        for number in random_numbers:
-            operation.append(number)
-            symbol_index = random.randint(0, len(symbols) - 1)
-            operation.append(symbols[symbol_index])
-        operation.pop(len(operation) - 1)
-        code = "".join(operation)
-        result = eval(code)
-        last = result - value
-        if last > 0:
-            code += "-" + str(last)
-        elif last < 0:
-            code += "+" + str(abs(last))
-        return code
+def create_name_updater(names, name_generator, index, previous=None):
+    """
+    It generates the new names of the code and creates the NameUpdater object that changes them.
+    :param names: The NameData object with the names of the code
+    :param name_generator: The NameGenerator object used to create the names
+    :param index: A SymbolIndex object with the modules imported between the abstract syntax trees
+    :param previous: A NameMapping object with the names of a previous mutation that are reused or None
+    :return: A NameUpdater object
+    """
+    if previous is not None:
+        name_generator.reserve(previous.get_new_names())
 
+    # Generate the names of the global variables and functions
+    name_relations = create_name_relations(names, name_generator, previous)
 
-class ImportUpdater(ast.NodeTransformer):
-    def __init__(self, modules, relations):
-        self.modules = modules
-        self.relations = relations
+    # Generate the names of the local variables
+    local_relations = create_local_relations(names, name_generator, previous)
 
-    def visit_Attribute(self, node):
-        """
-        Updates the attributes of imports
-        :param node: An ast.Attribute node
-        :return: An ast.Attribute node
-        """
-        attribute = ast.unparse(node)
-        point_position = attribute.rfind(".")
-        if point_position == -1:
-            return node
-        attribute = attribute[:point_position]
-        if attribute in self.modules:
-            node.attr = self.relations[node.attr]
-        return node
+    mapping = create_name_mapping(names, name_relations, local_relations)
+    return NameUpdater(mapping, names.function_names, index)
 
 
-class DataClass:
+def add_term(expression, result, symbol, term, term_result, location):
     """
-    It stores the relevant names of a class
+    It adds or subtracts a term to an expression.
+    :param expression: The node of the expression or None if it is empty
+    :param result: The value of the expression
+    :param symbol: The class of the operator, ast.Add or ast.Sub
+    :param term: The node of the term
+    :param term_result: The value of the term
+    :param location: A dictionary with the position of the new node in the code
+    :return: A tuple with the node of the new expression and its value
     """
-    def __init__(self):
-        # Name of the class
-        self.class_name = ""
+    if expression is None:
+        return term, term_result
+    return ast.BinOp(expression, symbol(), term, **location), ARITHMETIC_OPERATORS[symbol](result, term_result)
+
+
+def get_operands(node):
+    """
+    It obtains the operands of an operation.
+    :param node: A BinOp or UnaryOp node
+    :return: A tuple with the nodes of the operands
+    """
+    if isinstance(node, ast.BinOp):
+        return node.left, node.right
+    return (node.operand,)
+
+
+def get_constant_value(node):
+    """
+    It obtains the value of a constant. The negative numbers are represented with a UnaryOp node.
+    :param node: A node
+    :return: A tuple with the value or None if the node is not a constant of a type that can be reduced
+    """
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value = get_constant_value(node.operand)
+        if value is None or not isinstance(value[0], (int, float, complex)):
+            return None
+        return (-value[0],)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, complex, str, bytes)):
+        return (node.value,)
+    return None
 
-        # List of attributes
-        self.attributes = []
 
-        # List of the functions
-        self.functions = []
+def create_constant(value, location):
+    """
+    It creates the node of a constant. The negative numbers are represented with a UnaryOp node, so they keep their
+    value when they are the base of a power or have an attribute.
+    :param value: The value of the constant
+    :param location: A dictionary with the position of the constant in the code
+    :return: A Constant or UnaryOp node
+    """
+    if (isinstance(value, int) or isinstance(value, float)) and math.copysign(1, value) < 0:
+        return ast.UnaryOp(ast.USub(), ast.Constant(-value, **location), **location)
+    return ast.Constant(value, **location)
 
-        # Dictionary that stores every local variable in each function
-        self.local_variables = {}
 
-        # Dictionary with the old names of the variables of the class as keys and the new generated names as values
-        self.name_relations = {}
+def is_small_operation(symbol, left, right):
+    """
+    It checks that an operation between constants can be reduced. The operations whose result would be too big to be
+    written in the code and the formatting of strings are not reduced.
+    :param symbol: The class of the operator
+    :param left: The value of the left operand
+    :param right: The value of the right operand
+    :return: True if the operation can be reduced, otherwise False
+    """
+    if isinstance(left, str) or isinstance(left, bytes):
+        if symbol is ast.Mod:
+            return False
+        if symbol is ast.Mult and isinstance(right, int):
+            return len(left) * right <= MAX_REDUCED_LENGTH
+        return True
+    if isinstance(right, str) or isinstance(right, bytes):
+        if symbol is ast.Mult and isinstance(left, int):
+            return len(right) * left <= MAX_REDUCED_LENGTH
+        return True
+    if isinstance(left, int) and isinstance(right, int):
+        if symbol is ast.Mult:
+            return left.bit_length() + right.bit_length() <= MAX_REDUCED_BITS
+        if symbol is ast.Pow:
+            return right <= 0 or left.bit_length() * right <= MAX_REDUCED_BITS
+        if symbol is ast.LShift:
+            return left.bit_length() + right <= MAX_REDUCED_BITS
+    return True
 
 
-global_variables = []
-function_names = []
-local_variables = {}
-classes = []
+def get_location(node):
+    """
+    It obtains the position of a node in the code, so it can be copied to the nodes created in its place. The nodes of
+    the trees built without parsing code may not have a position.
+    :param node: A node
+    :return: A dictionary with the line and column where the node starts and ends, if the node has them
+    """
+    attributes = ["lineno", "col_offset", "end_lineno", "end_col_offset"]
+    return {attribute: getattr(node, attribute) for attribute in attributes if hasattr(node, attribute)}
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Mutates the code of python files",
-        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
-    )
-    parser.add_argument(
-        "file",
-        metavar='File(s)',
-        type=str,
-        help="File(s) to be mutated",
-        nargs="+"
-    )
-    args = parser.parse_args()
+def add_missing_locations(tree):
+    """
+    It gives the position of their parent to the nodes without a position, like ast.fix_missing_locations, so a tree
+    built without parsing code can be mutated and unparsed. The nodes are visited without recursion, so the deep trees
+    do not reach the recursion limit.
+    :param tree: An abstract syntax tree
+    :return: The same tree
+    """
+    pending = [(tree, 1, 0, 1, 0)]
+    while pending:
+        node, lineno, col_offset, end_lineno, end_col_offset = pending.pop()
+        if "lineno" in node._attributes:
+            if not hasattr(node, "lineno"):
+                node.lineno = lineno
+            lineno = node.lineno
+        if "col_offset" in node._attributes:
+            if not hasattr(node, "col_offset"):
+                node.col_offset = col_offset
+            col_offset = node.col_offset
+        if "end_lineno" in node._attributes:
+            if getattr(node, "end_lineno", None) is None:
+                node.end_lineno = end_lineno
+            end_lineno = node.end_lineno
+        if "end_col_offset" in node._attributes:
+            if getattr(node, "end_col_offset", None) is None:
+                node.end_col_offset = end_col_offset
+            end_col_offset = node.end_col_offset
+        pending.extend((child, lineno, col_offset, end_lineno, end_col_offset) for child in ast.iter_child_nodes(node))
+    return tree
 
-    mutate(args.file)
+
+def get_tool_version():
+    """
+    It obtains a hash of the source code of this program. The mutations cached by other versions are not used.
+    :return: A string with the hash
+    """
+    with open(__file__, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_hot_functions(path):
+    """
+    It reads a profile saved by cProfile or profile and obtains its hot functions, where the code spends at least
+    HOT_TIME_SHARE of the total time without counting the functions they call.
+    :param path: The path of the profile
+    :return: A dictionary with the files of the profile and the sets of first lines of their hot functions
+    """
+    stats = pstats.Stats(path).stats
+    total_time = sum(own_time for _, _, own_time, _, _ in stats.values())
+    hot_functions = {}
+    for (file, line, function), (_, _, own_time, _, _) in stats.items():
+        if total_time > 0 and own_time >= total_time * HOT_TIME_SHARE and file.endswith(".py") and \
+                function != "<module>":
+            hot_functions.setdefault(file, set()).add(line)
+    return hot_functions
+
+
+def get_cache_key(*values):
+    """
+    It obtains the key of an element of the cache. The values are hashed with their representation, because the
+    pickled values are different when their equal strings are the same object or not, like after loading them.
+    :param values: The values that identify the element. They must be built from strings, numbers, bytes, None and
+    lists or tuples of them, so their representation does not depend on the execution
+    :return: A string with the hash of the values
+    """
+    return hashlib.sha256(repr(values).encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def load_cache(path):
+    """
+    It reads an element of the cache.
+    :param path: The path of the element
+    :return: The stored object or None if it is not in the cache
+    """
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
 
 
-def mutate(files):
+def save_file_atomically(path, data):
     """
-    It reads a python source code file and mutates the code.
+    It writes a file in a temporary file first and then replaces the file, so a process that reads it at the same time
+    never finds a partial file.
+    :param path: The path of the file
+    :param data: The bytes to write
     :return:
     """
+    temporary_path = str(path) + "." + str(os.getpid()) + ".tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(data)
+    os.replace(temporary_path, path)
 
-    # Obtain a list of the modules in the files
-    modules = [file.replace(".py", "").replace(chr(47), ".") for file in files]
 
-    # Obtain a list of the abstract syntax trees
-    trees = get_trees(files)
-
-    # Performs modifications in the nodes of a list of trees
-    trees = expand_nodes(trees)
+def save_cache(path, value):
+    """
+    It writes an element of the cache, so a cache read at the same time never contains a partial element.
+    :param path: The path of the element
+    :param value: The object to store
+    :return:
+    """
+    save_file_atomically(path, pickle.dumps(value))
+
+
+def load_name_mapping(path):
+    """
+    It reads a mapping file with the new names and the modules of previous mutations.
+    :param path: The path of the mapping file
+    :return: A tuple with a NameMapping object and a dictionary with the files and the ModuleSymbols objects of the
+    modules, or None and an empty dictionary if the file does not exist
+    """
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None, {}
+    mapping = NameMapping()
+    mapping.name_relations = data["names"]
+    mapping.local_relations = data["locals"]
+    mapping.class_relations = data["classes"]
+    mapping.class_local_relations = data["class_locals"]
+    mapping.attribute_relations = data["attributes"]
+    mapping.class_body_names = {class_name: set(names) for class_name, names in data["class_bodies"].items()}
+    modules = {}
+    for file, module in data["modules"].items():
+        symbols = modules[file] = ModuleSymbols()
+        symbols.definitions = set(module["definitions"])
+        symbols.imports = [tuple(module_import) for module_import in module["imports"]]
+    return mapping, modules
+
+
+def save_name_mapping(path, mapping, modules):
+    """
+    It writes the new names and the modules of a mutation in a compact JSON file. The file is replaced at once, like
+    the elements of the cache.
+    :param path: The path of the mapping file
+    :param mapping: A NameMapping object
+    :param modules: A dictionary with the files and the ModuleSymbols objects of the modules
+    :return:
+    """
+    data = {
+        "names": mapping.name_relations,
+        "locals": mapping.local_relations,
+        "classes": mapping.class_relations,
+        "class_locals": mapping.class_local_relations,
+        "attributes": mapping.attribute_relations,
+        "class_bodies": {class_name: sorted(names) for class_name, names in mapping.class_body_names.items()},
+        "modules": {file: {"definitions": sorted(symbols.definitions), "imports": symbols.imports}
+                    for file, symbols in modules.items()}
+    }
+    save_file_atomically(path, json.dumps(data, separators=(",", ":")).encode())
+
+
+def analyse_file(file, transformations, seed=None, hot_lines=None, profile=None):
+    """
+    It obtains the modified abstract syntax tree of a file with the information about its names.
+    :param file: A file with source code
+    :param transformations: A list with the names of the transformations of the nodes to be performed
+    :param seed: The seed of the mutation
+    :param hot_lines: A set with the first lines of the hot functions of the file or None to not protect the hot code
+    :param profile: A Profile object where the stages are measured or None
+    :return: A tuple with the tree, a NameData object with its names, a set with its identifiers and a ModuleSymbols
+    object with its imports
+    """
+    if profile is None:
+        profile = Profile(False)
+    tree = prepare_tree(file, None, transformations, seed, hot_lines, shard=None, profile=profile)
+    with profile.measure("analyse", file, "names") as record:
+        names = NameData()
+        get_names_info(tree, names)
+        identifiers = get_identifiers(tree)
+        symbols = get_module_symbols(tree)
+        record["count"] = len(identifiers)
+    return tree, names, identifiers, symbols
+
+
+def scan_file(file, profile=None):
+    """
+    It obtains the information about the names of a file that is needed to generate the new names. The nodes are not
+    expanded, because the expansions do not add names, and the tree is not kept.
+    :param file: A file with source code
+    :param profile: A Profile object where the stages are measured or None
+    :return: A tuple with a NameData object with the names of the file and a ModuleSymbols object with its imports
+    """
+    if profile is None:
+        profile = Profile(False)
+    with profile.measure("parse", file) as record:
+        tree = get_trees([file])[0]
+    if profile.enabled:
+        record["count"] = count_nodes(tree)
+    with profile.measure("analyse", file, "names") as record:
+        names = NameData()
+        get_names_info(tree, names)
+        symbols = get_module_symbols(tree)
+        record["count"] = len(names.global_variables) + len(names.function_names) + len(names.classes)
+    return names, symbols
+
+
+def mutate_file(file, transformations, name_updater, seed=None, hot_lines=None, directory=RESULTS_DIRECTORY,
+                bytecode=False, original=None, profile=None):
+    """
+    It reads a file, mutates it and saves it. The mutated code is not returned, so it is freed with the tree.
+    :param file: A file with source code
+    :param transformations: A list with the names of the transformations of the nodes to be performed
+    :param name_updater: A NameUpdater object with the new names
+    :param seed: The seed of the mutation
+    :param hot_lines: A set with the first lines of the hot functions of the file or None to not protect the hot code
+    :param directory: The directory where the code is saved
+    :param bytecode: If it is True, the tree is compiled and saved as a pyc file instead of generating its code
+    :param original: A file with the same content whose random changes are performed in the nodes or None to use the
+    ones of the file
+    :param profile: A Profile object where the stages are measured or None
+    :return:
+    """
+    tree = prepare_tree(original or file, None, transformations, seed, hot_lines, shard=None, profile=profile)
+    finish_tree(file, tree, name_updater, seed, directory, bytecode, shard=None, profile=profile)
 
-    # Get the information about the variable names
-    exclusions = manage_names(trees)
 
-    # Generate the names of the global variables and functions
-    name_relations = create_name_relations(exclusions)
+def get_identifiers(tree):
+    """
+    It obtains every identifier of a tree that a NameUpdater object can change.
+    :param tree: An abstract syntax tree
+    :return: A set with the identifiers
+    """
+    identifiers = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            identifiers.add(node.id)
+        elif isinstance(node, ast.arg):
+            identifiers.add(node.arg)
+        elif isinstance(node, ast.Attribute):
+            identifiers.add(node.attr)
+        elif isinstance(node, ast.FunctionDef) or isinstance(node, ast.AsyncFunctionDef) or \
+                isinstance(node, ast.ClassDef):
+            identifiers.add(node.name)
+        elif isinstance(node, ast.ImportFrom):
+            identifiers.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.Global) or isinstance(node, ast.Nonlocal):
+            identifiers.update(node.names)
+        elif isinstance(node, ast.ExceptHandler) or isinstance(node, ast.MatchAs) or isinstance(node, ast.MatchStar):
+            identifiers.add(node.name)
+        elif isinstance(node, ast.MatchMapping):
+            identifiers.add(node.rest)
+        elif isinstance(node, ast.MatchClass):
+            identifiers.update(node.kwd_attrs)
+    identifiers.discard(None)
+    return identifiers
+
+
+def mutate_variant(variant, analysis, files, mutator):
+    """
+    It creates a variant of the mutation of some files from a copy of their analysis and saves it.
+    :param variant: The number of the variant
+    :param analysis: The pickled trees, NameData object, exclusions and SymbolIndex object obtained from the files
+    :param files: A list of files
+    :param mutator: The Mutator object with the options of the mutation
+    :return:
+    """
+    trees, names, exclusions, index = pickle.loads(analysis)
+    seed = mutator.seed
+    if seed is not None:
+        seed = str(seed) + chr(0) + "variant" + chr(0) + str(variant)
+    directory = RESULTS_DIRECTORY + "/variant_" + format(variant, "04d")
+
+    # The nodes were already reduced when the files were analysed
+    transformations = [transformation for transformation in mutator.transformations if transformation != "reduce"]
+
+    # Performs the random modifications of the nodes
+    trees = [expand_nodes([tree], transformations, get_random_generator(seed, "expand", file),
+                          mutator.get_hot_lines(file))[0] for file, tree in zip(files, trees)]
+
+    # Generate the new names
+    name_updater = create_name_updater(names, mutator.create_name_generator(exclusions, seed), index)
+
+    # Change the names and generate the final code of every tree
+    create_final_directory(files, directory)
+    for file, tree in zip(files, trees):
+        finish_tree(file, tree, name_updater, seed, directory, mutator.bytecode)
+
+
+def prepare_tree(file, code, transformations, seed=None, hot_lines=None, shard=None, profile=None):
+    """
+    It obtains the abstract syntax tree of a file and performs the modifications of its nodes.
+    :param file: A file with source code
+    :param code: The source code or the abstract syntax tree of the file. If it is None, the file is read
+    :param transformations: A list with the names of the transformations of the nodes to be performed
+    :param seed: The seed of the mutation
+    :param hot_lines: A set with the first lines of the hot functions of the file or None to not protect the hot code
+    :param shard: The number of the shard of the file that is modified or None if the file is not split
+    :param profile: A Profile object where the stages are measured or None
+    :return: The modified abstract syntax tree
+    """
+    if profile is None:
+        profile = Profile(False)
+
+    # Obtain the abstract syntax tree
+    with profile.measure("parse", file) as record:
+        if code is None:
+            trees = get_trees([file])
+        elif isinstance(code, str):
+            trees = [ast.parse(code)]
+        else:
+            trees = [add_missing_locations(code)]
+    if profile.enabled:
+        record["count"] = count_nodes(trees[0])
+
+    # Performs modifications in the nodes of the tree
+    with profile.measure("expand", file) as record:
+        keys = [file] if shard is None else [file, shard]
+        trees = expand_nodes(trees, transformations, get_random_generator(seed, "expand", *keys), hot_lines)
+    if profile.enabled:
+        record["count"] = count_nodes(trees[0])
+    return trees[0]
+
+
+def finish_tree(file, tree, name_updater, seed=None, directory=RESULTS_DIRECTORY, bytecode=False, shard=None,
+                profile=None):
+    """
+    It changes the names of an abstract syntax tree, generates its code and saves it.
+    :param file: The file where the tree was read
+    :param tree: An abstract syntax tree
+    :param name_updater: A NameUpdater object with the new names
+    :param seed: The seed of the mutation
+    :param directory: The directory where the code is saved or None to not save it
+    :param bytecode: If it is True, the tree is compiled and saved as a pyc file instead of generating its code
+    :param shard: The number of the shard of the file of the tree or None if the file is not split
+    :param profile: A Profile object where the stages are measured or None
+    :return: The mutated source code or None if the tree is compiled
+    """
+    if profile is None:
+        profile = Profile(False)
+    nodes = count_nodes(tree) if profile.enabled else 0
+    keys = [file] if shard is None else [file, shard]
 
     # Change the variable names
-    trees = modify_names(trees, exclusions, name_relations, modules)
+    with profile.measure("rename", file) as record:
+        name_updater.rename(tree, file)
+        record["count"] = nodes
 
     # Change the position of the functions
-    trees = update_function_locations(trees)
-
-    # Generates the code of the modified trees
-    sources = [ast.unparse(tree) for tree in trees]
+    with profile.measure("locations", file) as record:
+        trees = update_function_locations([tree], get_random_generator(seed, "locations", *keys))
+        record["count"] = nodes
+
+    # Compiles the tree without generating its code, which would be parsed again to compile it
+    if bytecode:
+        with profile.measure("compile", file) as record:
+            code = compile(ast.fix_missing_locations(trees[0]), file, "exec", dont_inherit=True)
+            record["count"] = nodes
+        if directory is not None:
+            with profile.measure("save", file, "bytes") as record:
+                record["count"] = save_bytecode(file, code, directory)
+        return None
+
+    # Generates the code of the modified tree
+    with profile.measure("unparse", file) as record:
+        sources = [ast.unparse(tree) for tree in trees]
+        record["count"] = nodes
 
     # Adds random comments in the code
-    sources = [add_comments(source) for source in sources]
+    with profile.measure("comments", file, "lines") as record:
+        random_generator = get_random_generator(seed, "comments", *keys)
+        sources = [add_comments(source, random_generator) for source in sources]
+    if profile.enabled:
+        record["count"] = sources[0].count(chr(10)) + 1
 
     # Saves the final code
-    create_final_directory(files)
-    save_source_code(files, sources)
+    if directory is not None:
+        with profile.measure("save", file, "bytes") as record:
+            save_source_code([file], sources, directory)
+            record["count"] = len(sources[0])
+    return sources[0]
+
+
+def split_module(file, code, shard_lines, profile=None):
+    """
+    It splits a module in shards of about shard_lines lines, which are cut between its top-level statements. The source
+    code of every shard starts with empty lines, so its nodes keep the lines that they have in the module.
+    :param file: A file with source code
+    :param code: The source code or the abstract syntax tree of the file. If it is None, the file is read
+    :param shard_lines: The approximate number of lines of every shard. The smaller modules are not split
+    :param profile: A Profile object where the stages are measured or None
+    :return: A list with the source code or the abstract syntax tree of every shard
+    """
+    if profile is None:
+        profile = Profile(False)
+    with profile.measure("split", file, "lines") as record:
+        if code is None:
+            with open(file, "r") as f:
+                code = f.read()
+        if isinstance(code, str):
+            lines = code.split(chr(10))
+            record["count"] = len(lines)
+            if len(lines) <= shard_lines:
+                return [code]
+            body = ast.parse(code).body
+        else:
+            body = code.body
+            record["count"] = getattr(body[-1], "end_lineno", 0) if body else 0
+            if record["count"] <= shard_lines:
+                return [code]
+
+        # A shard starts in the first statement after shard_lines lines that does not share a line with the previous one
+        starts = [1]
+        cuts = [0]
+        for i in range(1, len(body)):
+            start = min([body[i].lineno] + [node.lineno for node in getattr(body[i], "decorator_list", [])])
+            if start - starts[-1] >= shard_lines and start > body[i - 1].end_lineno:
+                starts.append(start)
+                cuts.append(i)
+        if len(cuts) == 1:
+            return [code]
+        if not isinstance(code, str):
+            cuts.append(len(body))
+            return [ast.Module(body=body[cuts[k]:cuts[k + 1]], type_ignores=code.type_ignores if k == 0 else [])
+                    for k in range(len(cuts) - 1)]
+        starts.append(len(lines) + 1)
+        return [chr(10) * (starts[k] - 1) + chr(10).join(lines[starts[k] - 1:starts[k + 1] - 1])
+                for k in range(len(starts) - 1)]
+
+
+def profile_stage(function, file, *arguments):
+    """
+    It measures a stage of a file. It is used to obtain the measures of the stages performed in other processes.
+    :param function: The function of the stage. It receives a Profile object in the keyword argument profile
+    :param file: The file
+    :param arguments: The other arguments of the function
+    :return: A tuple with the result of the function and a list with the measures
+    """
+    profile = Profile()
+    result = function(file, *arguments, profile=profile)
+    return result, profile.records
+
+
+def count_nodes(tree):
+    """
+    It counts the nodes of an abstract syntax tree.
+    :param tree: An abstract syntax tree
+    :return: The number of nodes
+    """
+    return sum(1 for _ in ast.walk(tree))
+
+
+def format_bytes(size):
+    """
+    It converts an amount of memory into a readable string.
+    :param size: The number of bytes
+    :return: A string with the size in B, KiB, MiB or GiB
+    """
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return str(round(size, 1)) + " " + unit
+        size /= 1024
+    return str(round(size, 1)) + " GiB"
 
 
 def get_trees(files):
@@ -243,100 +3211,102 @@ def get_trees(files):
     return trees
 
 
-def expand_nodes(trees):
+def get_archive_format(file):
+    """
+    It obtains the format of an archive from its name.
+    :param file: A file
+    :return: "zip" for the zip archives, the compression of the tar archives or None if the file is not an archive
+    """
+    for suffix, archive_format in ARCHIVE_FORMATS.items():
+        if file.lower().endswith(suffix):
+            return archive_format
+    return None
+
+
+def read_archive(archive):
+    """
+    It reads the python files of an archive without extracting them.
+    :param archive: The path of a zip or tar archive
+    :return: A tuple with a list of the names of the python members and a list with their source code
+    """
+    members = []
+    codes = []
+    if get_archive_format(archive) == "zip":
+        with zipfile.ZipFile(archive) as source:
+            for info in source.infolist():
+                if not info.is_dir() and info.filename.endswith(".py"):
+                    members.append(info.filename)
+                    codes.append(importlib.util.decode_source(source.read(info)))
+    else:
+        with tarfile.open(archive, "r|*") as source:
+            for member in source:
+                if member.isfile() and member.name.endswith(".py"):
+                    members.append(member.name)
+                    codes.append(importlib.util.decode_source(source.extractfile(member).read()))
+    return members, codes
+
+
+def get_archive_modules(members):
+    """
+    It obtains the paths of the python members of an archive relative to the directory where they are imported from,
+    like the directory with the name and the version of a source distribution or its "src" directory. The directories
+    with an __init__.py file are packages.
+    :param members: A list with the names of the python members
+    :return: A list with the paths, which are used as the names of the files of the members
+    """
+    packages = {posixpath.dirname(member) for member in members if posixpath.basename(member) == "__init__.py"}
+    paths = []
+    for member in members:
+        directory = posixpath.dirname(member)
+        while directory in packages:
+            directory = posixpath.dirname(directory)
+        paths.append(member[len(directory) + 1:] if directory else member)
+
+    # Two members that would be the same module keep their whole names
+    repeated = {path for path, count in collections.Counter(paths).items() if count > 1}
+    return [member if path in repeated else path for member, path in zip(members, paths)]
+
+
+def expand_nodes(trees, transformations=TRANSFORMATIONS, random_generator=random, hot_lines=None):
     """
     It performs the modification of the nodes of a list of trees.
     :param trees: A list of abstract syntax trees
+    :param transformations: A list with the names of the transformations to be performed
+    :param random_generator: The random number generator used by the transformations
+    :param hot_lines: A set with the first lines of the hot functions or None to not protect the hot code
     :return: A list with modified abstract syntax trees
     """
     result = []
     for tree in trees:
-        # Perform some expansions in the tree
-        tree = ast.fix_missing_locations(ReduceBinOp().visit(tree))
-        tree = ast.fix_missing_locations(ExpandString().visit(tree))
-        tree = ast.fix_missing_locations(RepairJoinedStr().visit(tree))
-        tree = ast.fix_missing_locations(ExpandInteger().visit(tree))
-
-        # Change the pass locations
-        delete_pass(tree)
-        add_pass(tree)
-        fix_pass(tree)
+        # Perform the expansions and change the pass locations walking the tree once. The new nodes are created with
+        # the position of the nodes that they replace, so the tree does not have to be walked again to fix them
+        tree = ExpandNodes(transformations, random_generator, hot_lines).visit(tree)
 
         # Save the result
         result.append(tree)
     return result
 
 
-def delete_pass(tree):
-    """
-    It deletes the reserved word "pass" from the bodies where it does not do anything
-    :param tree: The abstract syntax tree to walk
-    :return: This function modifies the pointer of tree variable so does not return anything
-    """
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Module) or isinstance(node, ast.If) or isinstance(node, ast.For) or \
-                isinstance(node, ast.While) or isinstance(node, ast.Try) or isinstance(node, ast.AsyncFor) or \
-                isinstance(node, ast.FunctionDef) or isinstance(node, ast.ClassDef) or \
-                isinstance(node, ast.AsyncFunctionDef):
-            to_remove = []
-            for element in node.body:
-                if isinstance(element, ast.Pass) and len(node.body) > 1:
-                    to_remove.append(element)
-            for element in to_remove:
-                node.body.remove(element)
-        if isinstance(node, ast.If) or isinstance(node, ast.For) or isinstance(node, ast.While) or \
-                isinstance(node, ast.Try) or isinstance(node, ast.AsyncFor):
-            to_remove = []
-            for element in node.orelse:
-                if isinstance(element, ast.Pass) and len(node.orelse) > 1:
-                    to_remove.append(element)
-            for element in to_remove:
-                node.body.append(element)
-        if isinstance(node, ast.Try):
-            to_remove = []
-            for element in node.finalbody:
-                if isinstance(element, ast.Pass) and len(node.finalbody) > 1:
-                    to_remove.append(element)
-            for element in to_remove:
-                node.body.remove(element)
-
-
-def add_pass(tree):
+def change_pass_locations(statements, random_generator=random):
     """
-    It adds the reserved word "pass" in the body of the nodes of an AST
-    :param tree: The abstract syntax tree to walk
-    :return: This function modifies the pointer of tree variable so does not return anything
+    It deletes the reserved word "pass" from a list of statements where it does not do anything and adds it randomly
+    :param statements: A list of statements
+    :param random_generator: The random number generator used to choose the new locations
+    :return: A new list of statements
     """
+    if not statements:
+        return statements
+    result = [statement for statement in statements if not isinstance(statement, ast.Pass)]
+    if not result:
+        result = statements[:1]
     probability = 0.5
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Module) or isinstance(node, ast.If) or isinstance(node, ast.For) or\
-                isinstance(node, ast.While) or isinstance(node, ast.Try) or isinstance(node, ast.AsyncFor) or\
-                isinstance(node, ast.FunctionDef) or isinstance(node, ast.ClassDef) or\
-                isinstance(node, ast.AsyncFunctionDef):
-            position = 0
-            for i in range(len(node.body)):
-                if random.random() < probability:
-                    k = random.randint(1, 5)
-                    for j in range(k):
-                        node.body.insert(position, ast.Pass())
-                    position = i + k + position
-        if isinstance(node, ast.If) or isinstance(node, ast.For) or isinstance(node, ast.While) or \
-                isinstance(node, ast.Try) or isinstance(node, ast.AsyncFor):
-            position = 0
-            for i in range(len(node.orelse)):
-                if random.random() < probability:
-                    k = random.randint(1, 5)
-                    for j in range(k):
-                        node.orelse.insert(position, ast.Pass())
-                    position = i + k + position
-        if isinstance(node, ast.Try):
-            position = 0
-            for i in range(len(node.finalbody)):
-                if random.random() < probability:
-                    k = random.randint(1, 5)
-                    for j in range(k):
-                        node.finalbody.insert(position, ast.Pass())
-                    position = i + k + position
+    final_statements = []
+    for statement in result:
+        if random_generator.random() < probability:
+            final_statements += [ast.copy_location(ast.Pass(), statement)
+                                 for _ in range(random_generator.randint(1, 5))]
+        final_statements.append(statement)
+    return final_statements
 
 
 def fix_pass(tree):
@@ -365,556 +3335,245 @@ def fix_pass(tree):
         del tree.body[position]
 
 
-def manage_names(trees):
+def manage_names(trees, names):
     """
-    It obtains the names and its type (local, global, function...) and stores this information in some global variables.
+    It obtains the names and its type (local, global, function...) and stores this information in a NameData object.
     :param trees: A list of abstract syntax trees
-    :return: A list with all the variable names
+    :param names: The NameData object where the names are stored
+    :return: A set with all the variable names
     """
-    exclusions = []
     for tree in trees:
         # Get the variables names of the source code
-        get_names_info(tree)
+        get_names_info(tree, names)
+    return get_exclusions(names)
 
-        # Stores all local variable names
-        unclassified_local_variables = [item for sublist in local_variables.values() for item in sublist]
 
-        for data_class in classes:
-            # Exclude the variable names detected in a class removing the magic methods and the "self" word
-            discard_necessary_names(data_class)
+def get_exclusions(names):
+    """
+    It obtains all the names of the code.
+    :param names: The NameData object with the names of the code
+    :return: A set with all the variable names
+    """
+    # Stores the global variables, function names and local variables.
+    # This is used to avoid to create the same names.
+    exclusions = set(names.global_variables)
+    exclusions.update(names.function_names)
+    for variables in names.local_variables.values():
+        exclusions.update(variables)
 
-            # Updates the list of local variables
-            unclassified_local_variables += [item for sublist in data_class.local_variables.values() for item in
-                                             sublist]
+    for data_class in names.classes:
+        exclusions.add(data_class.class_name)
+        exclusions.update(data_class.functions)
+        exclusions.update(data_class.attributes)
+        for variables in data_class.local_variables.values():
+            exclusions.update(variables)
+    return exclusions
 
-        # Removes the duplicated values of the list of local variables
-        unclassified_local_variables = list(set(unclassified_local_variables))
 
-        # Stores the global variables, function names and local variables.
-        # This is used to avoid to create the same names.
-        exclusions += global_variables + function_names + unclassified_local_variables
-    return list(set(exclusions))
+def merge_names(names, other_names):
+    """
+    It adds the names stored in a NameData object to other NameData object.
+    :param names: The NameData object where the names are added
+    :param other_names: The NameData object with the names to add
+    :return: It modifies names so does not return anything
+    """
+    names.global_variables += other_names.global_variables
+    names.function_names += other_names.function_names
+    for function, variables in other_names.local_variables.items():
+        names.local_variables.setdefault(function, []).extend(variables)
+    names.classes += other_names.classes
 
 
-def get_names_info(tree, function_name="", data_class=None):
+def get_names_info(tree, names):
     """
     It gets the names of variables in an abstract syntax tree.
     :param tree: The abstract syntax tree to walk
-    :param function_name: The function name that is being analyzed
-    :param data_class: The class that is being analyzed
-    :return: It modifies the variables global_variables, function_names, local_variables so does not return anything
-    """
-    for part in tree.body:
-        classify_names(part, function_name, data_class)
-
-    # If the statement has an "else" or "elif"
-    if isinstance(tree, ast.If) or isinstance(tree, ast.For) or isinstance(tree, ast.While) or \
-            isinstance(tree, ast.Try) or isinstance(tree, ast.AsyncFor):
-        for part in tree.orelse:
-            classify_names(part, function_name, data_class)
-
-    # If the statement has a "finally"
-    if isinstance(tree, ast.Try):
-        for part in tree.finalbody:
-            classify_names(part, function_name, data_class)
-
-
-def classify_names(part, function_name, data_class=None):
-    """
-    It classifies the variables in global, local or function names
-    :param part: The abstract syntax tree to walk
-    :param function_name: The function name that is being analyzed
-    :param data_class: The class that is being analyzed
-    :return: It modifies the variables global_variables, function_names, local_variables so does not return anything
-    """
-    if isinstance(part, ast.Name) and not function_name and data_class is None:
-        global_variables.append(part.id)
-    elif isinstance(part, ast.Name) and function_name and data_class is None:
-        local_variables[function_name] = local_variables.get(function_name, []) + [part.id]
-    elif isinstance(part, ast.Name) and not function_name and data_class is not None:
-        data_class.attributes.append(part.id)
-    elif isinstance(part, ast.Name) and function_name and data_class is not None:
-        data_class.local_variables[function_name] = data_class.local_variables.get(function_name, []) + [part.id]
-    elif isinstance(part, ast.arg) and data_class is None:
-        local_variables[function_name] = local_variables.get(function_name, []) + [part.arg]
-    elif isinstance(part, ast.arg) and data_class is not None:
-        data_class.local_variables[function_name] = data_class.local_variables.get(function_name, []) + [part.arg]
-    elif isinstance(part, ast.UnaryOp):
-        classify_names(part.operand, function_name, data_class)
-    elif isinstance(part, ast.BinOp):
-        classify_names(part.left, function_name, data_class)
-        classify_names(part.right, function_name, data_class)
-    elif isinstance(part, ast.BoolOp):
-        for value in part.values:
-            classify_names(value, function_name, data_class)
-    elif isinstance(part, ast.Compare):
-        classify_names(part.left, function_name, data_class)
-        for comparator in part.comparators:
-            classify_names(comparator, function_name, data_class)
-    elif isinstance(part, ast.Assign):
-        for target in part.targets:
-            classify_names(target, function_name, data_class)
-    elif isinstance(part, ast.Attribute) and data_class is None:
-        classify_names(part.value, function_name)
-    elif isinstance(part, ast.Attribute) and data_class is not None:
-        if isinstance(part.value, ast.Name) and part.value.id == "self":
-            data_class.attributes.append(part.attr)
-    elif isinstance(part, ast.NamedExpr) or isinstance(part, ast.AnnAssign) or isinstance(part, ast.AugAssign):
-        classify_names(part.target, function_name, data_class)
-    elif isinstance(part, ast.Tuple) or isinstance(part, ast.List) or isinstance(part, ast.Set):
-        for elt in part.elts:
-            classify_names(elt, function_name, data_class)
-    elif isinstance(part, ast.If) or isinstance(part, ast.While):
-        get_names_info(part, function_name, data_class)
-    elif isinstance(part, ast.Try):
-        get_names_info(part, function_name, data_class)
-        for handler in part.handlers:
-            classify_names(handler, function_name, data_class)
-    elif isinstance(part, ast.ExceptHandler):
-        get_names_info(part, function_name, data_class)
-    elif isinstance(part, ast.With) or isinstance(part, ast.AsyncWith):
-        for item in part.items:
-            classify_names(item.context_expr, function_name, data_class)
-            classify_names(item.optional_vars, function_name, data_class)
-        get_names_info(part, function_name, data_class)
-    elif isinstance(part, ast.ListComp) or isinstance(part, ast.SetComp) or isinstance(part, ast.GeneratorExp):
-        classify_names(part.elt, function_name, data_class)
-        for generator in part.generators:
-            classify_names(generator, function_name, data_class)
-    elif isinstance(part, ast.DictComp):
-        classify_names(part.key, function_name, data_class)
-        classify_names(part.value, function_name, data_class)
-        for generator in part.generators:
-            classify_names(generator, function_name, data_class)
-    elif isinstance(part, ast.comprehension):
-        classify_names(part.target, function_name, data_class)
-        classify_names(part.iter, function_name, data_class)
-        for comparator in part.ifs:
-            classify_names(comparator, function_name, data_class)
-    elif isinstance(part, ast.For) or isinstance(part, ast.AsyncFor):
-        classify_names(part.target, function_name, data_class)
-        get_names_info(part, function_name, data_class)
-    elif isinstance(part, ast.ClassDef):
-        class_info = DataClass()
-        class_info.class_name = part.name
-        get_names_info(part, function_name, class_info)
-        classes.append(class_info)
-    elif isinstance(part, ast.arguments):
-        for posonlyarg in part.posonlyargs:
-            classify_names(posonlyarg, function_name, data_class)
-        for arg in part.args:
-            classify_names(arg, function_name, data_class)
-        for kwonlyarg in part.kwonlyargs:
-            classify_names(kwonlyarg, function_name, data_class)
-        if part.kwarg:
-            classify_names(part.kwarg, function_name, data_class)
-        if part.vararg:
-            classify_names(part.vararg, function_name, data_class)
-    elif (isinstance(part, ast.FunctionDef) or isinstance(part, ast.AsyncFunctionDef)) and data_class is None:
-        function_names.append(part.name)
-        classify_names(part.args, part.name)
-        get_names_info(part, part.name)
-    elif (isinstance(part, ast.FunctionDef) or isinstance(part, ast.AsyncFunctionDef)) and data_class is not None:
-        data_class.functions.append(part.name)
-        classify_names(part.args, part.name, data_class)
-        get_names_info(part, part.name, data_class)
-
-
-def discard_necessary_names(class_data: DataClass):
-    """
-    It removes all magic methods and all visit_ methods stored in a DataClass object.
-    :param class_data: Is the DataClass object obtained from an AST
-    :return: Modifies the pointer to class_data
-    """
-    # remove magic and visit_ methods
-    for function in class_data.functions:
-        if function.startswith("__") and function.endswith("__"):
-            class_data.functions.remove(function)
-        elif function.startswith("visit_"):
-            class_data.functions.remove(function)
-    # remove self name
-    for function in class_data.local_variables.keys():
-        if "self" in class_data.local_variables[function]:
-            class_data.local_variables[function].remove("self")
-    # remove functions without local variables
-    function_to_remove = []
-    for function, variables in class_data.local_variables.items():
-        if not variables:
-            function_to_remove.append(function)
-    for function in function_to_remove:
-        class_data.local_variables.pop(function)
-
-
-def create_name_relations(exclusions):
+    :param names: The NameData object where the names are stored
+    :return: It modifies the lists and dictionaries of names so does not return anything
+    """
+    NameAnalyser(names).analyse(tree)
+
+
+def create_name_relations(names, name_generator, previous=None):
     """
     This function manages the creation of the names of global variables, functions, classes and functions of a class.
-    :param exclusions: A list with names that cannot be generated
+    :param names: The NameData object with the names of the code
+    :param name_generator: The NameGenerator object used to create the names
+    :param previous: A NameMapping object with the names of a previous mutation that are reused or None
     :return: A dictionary with the old names as a key and the new names as a value
     """
+    previous = previous or NameMapping()
     name_relations = {}
 
-    for old_name in global_variables:
-        new_name = generate_name(exclusions)
-        name_relations[old_name] = new_name
-        exclusions.append(new_name)
+    for old_name in names.global_variables:
+        name_relations[old_name] = name_generator.reuse(previous.name_relations.get(old_name))
 
-    for old_name in function_names:
-        new_name = generate_name(exclusions)
-        name_relations[old_name] = new_name
-        exclusions.append(new_name)
+    for old_name in names.function_names:
+        name_relations[old_name] = name_generator.reuse(previous.name_relations.get(old_name))
 
-    for data_class in classes:
-        new_name = generate_name(exclusions)
-        name_relations[data_class.class_name] = new_name
-        exclusions.append(new_name)
+    for data_class in names.classes:
+        name_relations[data_class.class_name] = name_generator.reuse(previous.name_relations.get(data_class.class_name))
 
-    for data_class in classes:
+    for data_class in names.classes:
+        class_relations = previous.class_relations.get(data_class.class_name, {})
         for function in data_class.functions:
-            new_name = generate_name(exclusions)
-            data_class.name_relations[function] = new_name
-            exclusions.append(new_name)
+            data_class.name_relations[function] = name_generator.reuse(class_relations.get(function))
 
         for attribute in data_class.attributes:
-            new_name = generate_name(exclusions)
-            data_class.name_relations[attribute] = new_name
-            exclusions.append(new_name)
+            data_class.name_relations[attribute] = name_generator.reuse(class_relations.get(attribute))
 
     return name_relations
 
 
-def modify_names(trees, exclusions, name_relations, modules):
+def create_local_relations(names, name_generator, previous=None):
+    """
+    This function manages the creation of the names of the local variables of the functions and the functions of a
+    class.
+    :param names: The NameData object with the names of the code
+    :param name_generator: The NameGenerator object used to create the names
+    :param previous: A NameMapping object with the names of a previous mutation that are reused or None
+    :return: A dictionary with the function names as keys and a dictionary with the old names of its local variables as
+    keys and the new names as values
+    """
+    previous = previous or NameMapping()
+    local_relations = {}
+    for function, variables in names.local_variables.items():
+        local_relations[function] = create_variable_relations(variables, name_generator,
+                                                              previous.local_relations.get(function))
+
+    for data_class in names.classes:
+        class_local_relations = previous.class_local_relations.get(data_class.class_name, {})
+        for function, variables in data_class.local_variables.items():
+            data_class.local_relations[function] = create_variable_relations(variables, name_generator,
+                                                                             class_local_relations.get(function))
+
+    return local_relations
+
+
+def create_variable_relations(variables, name_generator, previous_relations=None):
+    """
+    It generates a new name for every variable of a list.
+    :param variables: A list with the names of the variables
+    :param name_generator: The NameGenerator object used to create the names
+    :param previous_relations: A dictionary with the names of the variables in a previous mutation or None
+    :return: A dictionary with the old names as keys and the new names as values
+    """
+    previous_relations = previous_relations or {}
+    relations = {}
+    for variable in variables:
+        if variable not in relations:
+            relations[variable] = name_generator.reuse(previous_relations.get(variable))
+    return relations
+
+
+def create_name_mapping(names, name_relations, local_relations):
+    """
+    It stores all the new names of a mutation in a NameMapping object.
+    :param names: The NameData object with the names of the code and the relations of its classes
+    :param name_relations: A dictionary with the new names of the global variables, functions and classes
+    :param local_relations: A dictionary with the new names of the local variables of every function
+    :return: A NameMapping object
+    """
+    mapping = NameMapping()
+    mapping.name_relations = name_relations
+    mapping.local_relations = local_relations
+
+    # If two classes share a name, the first one has priority
+    for data_class in names.classes:
+        relations = mapping.class_relations.setdefault(data_class.class_name, {})
+        class_local_relations = mapping.class_local_relations.setdefault(data_class.class_name, {})
+        for old_name, new_name in data_class.name_relations.items():
+            relations.setdefault(old_name, new_name)
+            mapping.attribute_relations.setdefault(old_name, new_name)
+        for function, relations_of_function in data_class.local_relations.items():
+            class_local_relations.setdefault(function, relations_of_function)
+        mapping.class_body_names.setdefault(data_class.class_name, set()).update(data_class.body_names)
+    return mapping
+
+
+def extend_name_mapping(mapping, previous):
+    """
+    It adds to a mapping the names of a previous mapping that it does not have, like the names of the modules that were
+    not mutated again.
+    :param mapping: The NameMapping object that is extended
+    :param previous: The NameMapping object of the previous mutations
+    :return: It modifies mapping so does not return anything
+    """
+    for old_name, new_name in previous.name_relations.items():
+        mapping.name_relations.setdefault(old_name, new_name)
+    for old_name, new_name in previous.attribute_relations.items():
+        mapping.attribute_relations.setdefault(old_name, new_name)
+    for function, relations in previous.local_relations.items():
+        mapping.local_relations.setdefault(function, relations)
+    for class_name, relations in previous.class_relations.items():
+        mapping.class_relations.setdefault(class_name, relations)
+    for class_name, relations in previous.class_local_relations.items():
+        mapping.class_local_relations.setdefault(class_name, relations)
+    for class_name, names in previous.class_body_names.items():
+        mapping.class_body_names.setdefault(class_name, names)
+
+
+def modify_names(trees, names, name_relations, local_relations, files=None):
     """
     It changes the variable names in a list of abstract syntax trees
     :param trees: A list of abstract syntax trees
-    :param exclusions: A list with names that cannot be generated
+    :param names: The NameData object with the names of the code
     :param name_relations: A dictionary with the information of how the names are changed
-    :param modules: A list with the modules imported between the abstract syntax tree
+    :param local_relations: A dictionary with the information of how the local variables of every function are changed
+    :param files: A list with the files of the trees, used to resolve the imports between them, or None
     :return: A list of abstract syntax trees with the variable names changed
     """
     result = []
-    for tree in trees:
-        # Updates the variable names related to classes
-        for data_class in classes:
-            update_attributes(tree, data_class)
-            update_class_local_variables(tree, data_class, exclusions)
-            update_class_functions_name(tree, data_class)
-            change_class_name(tree, data_class.class_name, name_relations)
-
-        # Updates the variables not related with classes
-        update_global_variables(tree, name_relations)
-        update_local_variables(tree, exclusions)
-        update_functions_name(tree, name_relations)
-
-        # Updates the functions and variables imported in an ImportFrom
-        update_import_from(tree, modules, name_relations)
-
-        # Updates the functions and variables imported in as Import
-        tree = ast.fix_missing_locations(ImportUpdater(modules, name_relations).visit(tree))
+    if files is None:
+        files = [None] * len(trees)
+    mapping = create_name_mapping(names, name_relations, local_relations)
+    index = create_symbol_index([file for file in files if file is not None],
+                                [get_module_symbols(tree) for file, tree in zip(files, trees) if file is not None])
+    name_updater = NameUpdater(mapping, names.function_names, index)
+    for file, tree in zip(files, trees):
+        # Changes all the names of the tree walking it once
+        name_updater.rename(tree, file)
 
         # Save the modified tree
         result.append(tree)
     return result
 
 
-def update_attributes(tree, data_class):
-    """
-    It changes all names of attributes of a class.
-    :param tree: The abstract syntax tree to walk
-    :param data_class: The names of class to be changed
-    :return: This function modifies the pointer of tree variable and modifies the exclusion list adding the new names of
-    the attributes
-    """
-    for attribute in data_class.attributes:
-        new_name = data_class.name_relations.get(attribute)
-        change_attribute_name(tree, attribute, new_name, data_class.class_name)
-
-
-def change_attribute_name(tree, old_name, new_name, class_name):
-    """
-    It changes the attribute name of a class.
-    :param tree: The abstract syntax tree to walk
-    :param old_name: The attribute name to be changed
-    :param new_name: The new name of the old attribute
-    :param class_name: Class name where the attribute is located
-    :return: This function modifies the pointer of tree variable so does not return anything
-    """
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Attribute) and node.attr == old_name:
-            node.attr = new_name
-        elif isinstance(node, ast.ClassDef) and node.name == class_name:
-            for part in node.body:
-                if not isinstance(part, ast.Assign):
-                    continue
-                for target in part.targets:
-                    if isinstance(target, ast.Name) and target.id == old_name:
-                        target.id = new_name
-
-
-def generate_name(exclusions):
-    """
-    It creates a string different from a list of other names
-    :param exclusions: List with names that the result will not be equal
-    :return: A random string
-    """
-    new_name = get_random_name()
-    while new_name in exclusions:
-        new_name = get_random_name()
-    return new_name
-
-
-def get_random_name(min_len=5, max_len=15):
+def get_random_name(min_len=5, max_len=15, random_generator=random, style="letters"):
     """
     It generates a random string which has a length between min_len and max_len (default values are 5 and 15)
     :param min_len: Minimum possible length of the returned name
     :param max_len: Maximum possible length of the returned name
+    :param random_generator: The random number generator used to create the string
+    :param style: The style of the string. It is a key of NAME_STYLES
     :return: A random string with a length between min_len and max_len
     """
-    length = random.randint(min_len, max_len)
-    result_str = ''.join(random.choice(string.ascii_letters) for i in range(length))
+    first_characters, characters = NAME_STYLES[style]
+    length = random_generator.randint(min_len, max_len)
+    result_str = random_generator.choice(first_characters) + ''.join(random_generator.choices(characters, k=length - 1))
     return result_str
 
 
-def update_class_local_variables(tree, data_class, exclusions):
-    """
-    It changes all names of local variables in a class
-    :param tree: The abstract syntax tree to walk
-    :param data_class: Class data to be changed
-    :param exclusions: The list of excluded names
-    :return: This function modifies the pointer of tree variable so does not return anything
-    """
-    for function in data_class.local_variables.keys():
-        for local_variable in data_class.local_variables.get(function):
-            new_name = generate_name(exclusions)
-            change_class_local_variable(tree, local_variable, new_name, data_class.class_name, function)
-            exclusions.append(new_name)
-
-
-def change_class_local_variable(tree, old_name, new_name, class_name, function):
-    """
-    It changes the name of a local variable inside a function class
-    :param tree: The abstract syntax tree to walk
-    :param old_name: The local variable name to be changed
-    :param new_name: The new name of the old local variable
-    :param class_name: Class name where the local variable is located
-    :param function: Function name where the local variable is located
-    :return: This function modifies the pointer of tree variable so does not return anything
-    """
-    for node in ast.walk(tree):
-        if not isinstance(node, ast.ClassDef):
-            continue
-        if not node.name == class_name:
-            continue
-        for class_def_part in ast.walk(node):
-            if not isinstance(class_def_part, ast.FunctionDef):
-                continue
-            if class_def_part.name != function:
-                continue
-            for argument in class_def_part.args.args:
-                if argument.arg == old_name:
-                    argument.arg = new_name
-            for posonlyarg in class_def_part.args.posonlyargs:
-                if posonlyarg.arg == old_name:
-                    posonlyarg.arg = new_name
-            for kwonlyarg in class_def_part.args.kwonlyargs:
-                if kwonlyarg.arg == old_name:
-                    kwonlyarg.arg = new_name
-            if class_def_part.args.kwarg:
-                if class_def_part.args.kwarg.arg == old_name:
-                    class_def_part.args.kwarg.arg = new_name
-            if class_def_part.args.vararg:
-                if class_def_part.args.vararg.arg == old_name:
-                    class_def_part.args.vararg.arg = new_name
-            for function_def_part in ast.walk(class_def_part):
-                if isinstance(function_def_part, ast.Name) and function_def_part.id == old_name:
-                    function_def_part.id = new_name
-
-
-def update_class_functions_name(tree, data_class):
-    """
-    It changes all names of functions in a class
-    :param tree: The abstract syntax tree to walk
-    :param data_class: Class data to be changed
-    :return: This function modifies the pointer of tree variable so does not return anything
-    """
-    for function in data_class.functions:
-        new_name = data_class.name_relations.get(function)
-        change_class_function_name(tree, function, new_name, data_class.class_name)
-
-
-def change_class_function_name(tree, old_name, new_name, class_name):
-    """
-    It changes the name of a function of a class
-    :param tree: The abstract syntax tree to walk
-    :param old_name: The function name to be changed
-    :param new_name: The new name of the old function
-    :param class_name: Class name where the local variable is located
-    :return: This function modifies the pointer of tree variable so does not return anything
-    """
-    for node in ast.walk(tree):
-        if not isinstance(node, ast.ClassDef):
-            continue
-        if not node.name == class_name:
-            continue
-        for class_def_part in ast.walk(node):
-            if isinstance(class_def_part, ast.FunctionDef) and class_def_part.name == old_name:
-                class_def_part.name = new_name
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Attribute) and node.attr == old_name:
-            node.attr = new_name
-
-
-def change_class_name(tree, old_name, name_relations):
-    """
-    It changes the class name and all his declarations
-    :param tree: The abstract syntax tree to walk
-    :param old_name: The class name to be changed
-    :param name_relations: A dictionary with the information of how the names are changed
-    :return: This function modifies the pointer of tree variable so does not return anything
-    """
-    for node in ast.walk(tree):
-        if isinstance(node, ast.ClassDef) and node.name == old_name:
-            node.name = name_relations.get(old_name)
-        elif isinstance(node, ast.Name) and node.id == old_name:
-            node.id = name_relations.get(old_name)
-
-
-def update_global_variables(tree, name_relations):
-    """
-    It changes the names of the global variables
-    :param tree: The abstract syntax tree to walk
-    :param name_relations: A dictionary with the information of how the names are changed
-    :return: This function modifies the pointer of tree variable so does not return anything
-    """
-    for global_variable in global_variables:
-        new_name = name_relations.get(global_variable)
-        change_global_variable(tree, global_variable, new_name)
-
-
-def change_global_variable(tree, old_name, new_name):
-    """
-    It walks the abstract syntax tree changing all occurrences of a variable to a new_name.
-    :param tree: The abstract syntax tree to walk
-    :param old_name: The variable name to be changed
-    :param new_name: The new name of the old variable
-    :return: This function modifies the pointer of tree variable so does not return anything
-    """
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Name):
-            if node.id == old_name:
-                node.id = new_name
-
-
-def update_local_variables(tree, exclusions):
-    """
-    It changes the names of the local variables
-    :param tree: The abstract syntax tree to walk
-    :param exclusions: The list of excluded names
-    :return: This function modifies the pointer of tree variable so does not return anything
-    """
-    for function in local_variables.keys():
-        for local_variable in local_variables.get(function):
-            new_name = generate_name(exclusions)
-            change_local_variables(tree, local_variable, new_name, function)
-            exclusions.append(new_name)
-
-
-def change_local_variables(tree, old_name, new_name, function_name):
-    """
-    It changes all occurrences of the name of a variable in a specific function.
-    :param tree: The abstract syntax tree to walk
-    :param old_name: The variable name to be changed
-    :param new_name: The new name of the old variable
-    :param function_name: The name of the function where the old variable is.
-    :return: This function modifies the pointer of tree variable so does not return anything
-    """
-    for node in ast.walk(tree):
-        if not isinstance(node, ast.FunctionDef):
-            continue
-        if node.name != function_name:
-            continue
-        for argument in node.args.args:
-            if argument.arg == old_name:
-                argument.arg = new_name
-        for posonlyarg in node.args.posonlyargs:
-            if posonlyarg.arg == old_name:
-                posonlyarg.arg = new_name
-        for kwonlyarg in node.args.kwonlyargs:
-            if kwonlyarg.arg == old_name:
-                kwonlyarg.arg = new_name
-        if node.args.kwarg:
-            if node.args.kwarg.arg == old_name:
-                node.args.kwarg.arg = new_name
-        if node.args.vararg:
-            if node.args.vararg.arg == old_name:
-                node.args.vararg.arg = new_name
-        for part in ast.walk(node):
-            if isinstance(part, ast.Name):
-                if part.id == old_name:
-                    part.id = new_name
-
-
-def update_functions_name(tree, name_relations):
-    """
-    It changes the names of the functions
-    :param tree: The abstract syntax tree to walk
-    :param name_relations: A dictionary with the information of how the names are changed
-    :return: This function modifies the pointer of tree variable so does not return anything
-    """
-    for function in function_names:
-        new_name = name_relations.get(function)
-        change_function_name(tree, function, new_name)
-
-
-def change_function_name(tree, old_name, new_name):
-    """
-    It changes all occurrences of the name of a function
-    :param tree: The abstract syntax tree to walk
-    :param old_name: The function name to be changed
-    :param new_name: The new name of the old function
-    :return: This function modifies the pointer of tree variable so does not return anything
-    """
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Name):
-            if node.id == old_name:
-                node.id = new_name
-        elif isinstance(node, ast.FunctionDef):
-            if node.name == old_name:
-                node.name = new_name
-
-
-def update_import_from(tree, modules, name_relations):
-    """
-    It updates the ImportFrom names of an AST
-    :param tree: The abstract syntax tree to walk
-    :param modules: A list with the modules imported between the abstract syntax tree
-    :param name_relations: A dictionary with the information of how the names are changed
-    :return: This function modifies the pointer of tree variable so does not return anything
-    """
-    for node in ast.walk(tree):
-        if isinstance(node, ast.ImportFrom) and node.module in modules:
-            for i in range(len(node.names)):
-                old_name = node.names[i].name
-                node.names[i].name = name_relations[old_name]
-
-
-def update_function_locations(trees):
+def update_function_locations(trees, random_generator=random):
     """
     It changes the position of the functions in an abstract syntax tree
     :param trees: A list of abstract syntax trees
+    :param random_generator: The random number generator used to choose the new positions
     :return: A list of abstract syntax trees with the function position changed
     """
     result = []
     for tree in trees:
-        change_global_functions_location(tree)
-        change_class_functions_location(tree)
+        change_global_functions_location(tree, random_generator)
+        change_class_functions_location(tree, random_generator)
         result.append(tree)
     return result
 
 
-def change_global_functions_location(tree):
+def change_global_functions_location(tree, random_generator=random):
     """
     It changes the position of the definition of the functions
     :param tree: The abstract syntax tree to walk
+    :param random_generator: The random number generator used to choose the new positions
     :return: This function modifies the pointer of tree variable so does not return anything
     """
     function_locations = []
@@ -924,14 +3583,15 @@ def change_global_functions_location(tree):
     if len(function_locations) <= 1:
         return
     for i in range(len(function_locations)):
-        j, k = random.sample(function_locations, 2)
+        j, k = random_generator.sample(function_locations, 2)
         tree.body[j], tree.body[k] = tree.body[k], tree.body[j]
 
 
-def change_class_functions_location(tree):
+def change_class_functions_location(tree, random_generator=random):
     """
     It changes the position of the definition of the functions in every class
     :param tree: The abstract syntax tree to walk
+    :param random_generator: The random number generator used to choose the new positions
     :return: This function modifies the pointer of tree variable so does not return anything
     """
     for node in ast.walk(tree):
@@ -943,54 +3603,238 @@ def change_class_functions_location(tree):
             if len(function_locations) <= 1:
                 break
             for i in range(len(function_locations)):
-                j, k = random.sample(function_locations, 2)
+                j, k = random_generator.sample(function_locations, 2)
                 node.body[j], node.body[k] = node.body[k], node.body[j]
 
 
-def add_comments(code):
+def add_comments(code, random_generator=random):
     """
     It adds random one line comments in a python code
     :param code: The code where you want to add the comments
+    :param random_generator: The random number generator used to create the comments
     :return: The code with random comments
     """
     if not code:
         return ""
     lines = code.split(chr(10))
-    n = random.randint(len(lines) // 2, len(lines) * 2)
-    for _ in range(random.randint(1, n)):
-        position = random.randint(1, len(lines) - 1)
-        comment = "#" + get_random_name(1, 50)
-        spaces = random.randint(0, len(lines[position]) // 2)
-        lines.insert(position, " " * spaces + comment)
-    return chr(10).join(lines)
+    n = random_generator.randint(len(lines) // 2, len(lines) * 2)
+
+    # Number of comments added before every line. The comments are never added before the first line
+    last_position = max(1, len(lines) - 1)
+    comments = [0] * (last_position + 1)
+    for _ in range(random_generator.randint(1, max(1, n))):
+        comments[random_generator.randint(1, last_position)] += 1
+
+    # Generates the final code in a single pass
+    result = []
+    for position in range(last_position + 1):
+        next_line = lines[position] if position < len(lines) else ""
+        for _ in range(comments[position]):
+            comment = "#" + get_random_name(1, 50, random_generator)
+            spaces = random_generator.randint(0, len(next_line) // 2)
+            result.append(" " * spaces + comment)
+        if position < len(lines):
+            result.append(next_line)
+    return chr(10).join(result)
 
 
-def create_final_directory(files):
+def create_final_directory(files, directory=RESULTS_DIRECTORY):
     """
     It creates the directory of the mutated files
     :param files: A list of files
+    :param directory: The directory where the mutated files are saved
     :return:
     """
-    pathlib.Path("./results").mkdir(exist_ok=True)
+    pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
     for file in files:
         slash_position = file.rfind(chr(47))
         if slash_position > 0:
             folder = file[:slash_position]
-            pathlib.Path("./results/" + folder).mkdir(parents=True, exist_ok=True)
+            pathlib.Path(directory + "/" + folder).mkdir(parents=True, exist_ok=True)
 
 
-def save_source_code(files, sources):
+def restore_source_code(file, source, directory=RESULTS_DIRECTORY):
+    """
+    It saves a mutated code obtained from the cache if the saved file is different.
+    :param file: The file
+    :param source: The mutated code
+    :param directory: The directory where the mutated files are saved
+    :return:
+    """
+    try:
+        with open(directory + "/" + file, "r") as f:
+            if f.read() == source:
+                return
+    except OSError:
+        pass
+    save_source_code([file], [source], directory)
+
+
+def save_source_code(files, sources, directory=RESULTS_DIRECTORY):
     """
     It saves the new generated source code
     :param files: A list of files
     :param sources: The code to be saved
+    :param directory: The directory where the mutated files are saved
     :return:
     """
     for i in range(len(files)):
-        with open("./results/" + files[i], "w") as f:
+        with open(directory + "/" + files[i], "w") as f:
             f.flush()
             f.write(sources[i])
 
 
+def copy_mutated_file(file, duplicates, source, directory=RESULTS_DIRECTORY, bytecode=False):
+    """
+    It saves the mutated code of a file for the files with the same content.
+    :param file: The file whose mutated code is already saved
+    :param duplicates: A list with the files with the same content
+    :param source: The mutated code or None to copy the saved file, like when it was saved as bytecode
+    :param directory: The directory where the mutated files are saved
+    :param bytecode: If it is True, the pyc file of the file is copied
+    :return:
+    """
+    if source is not None:
+        save_source_code(duplicates, [source] * len(duplicates), directory)
+        return
+    if bytecode:
+        file = get_bytecode_file(file)
+        duplicates = [get_bytecode_file(duplicate) for duplicate in duplicates]
+    with open(directory + "/" + file, "rb") as f:
+        data = f.read()
+    for duplicate in duplicates:
+        with open(directory + "/" + duplicate, "wb") as f:
+            f.write(data)
+
+
+def get_bytecode_file(file):
+    """
+    It obtains the name of the pyc file that replaces a python file in the results directory.
+    :param file: A file with source code
+    :return: The name of the pyc file
+    """
+    if file.endswith(".py"):
+        return file + "c"
+    return file + ".pyc"
+
+
+def save_bytecode(file, code, directory=RESULTS_DIRECTORY):
+    """
+    It saves the compiled code of a file in a pyc file, which is imported without its source code. The header has
+    the hash of the original source code and it is not checked when the file is imported, because the mutated source
+    code is never generated.
+    :param file: The file where the code was read
+    :param code: The code object of the mutated file
+    :param directory: The directory where the mutated files are saved
+    :return: The number of saved bytes
+    """
+    with open(file, "rb") as f:
+        source_hash = importlib.util.source_hash(f.read())
+
+    # The flags of the header mark a pyc file based on a hash whose source is not checked
+    data = importlib.util.MAGIC_NUMBER + struct.pack("<I", 1) + source_hash + marshal.dumps(code)
+    with open(directory + "/" + get_bytecode_file(file), "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def save_archive(archive, output, sources):
+    """
+    It saves a copy of an archive with the mutated code of its python members. The other members of a zip archive are
+    copied without decompressing them, and the RECORD file of a wheel is updated with the hashes of the mutated members.
+    :param archive: The path of the original archive
+    :param output: The path of the new archive
+    :param sources: A dictionary with the names of the python members as keys and their mutated code as values
+    :return:
+    """
+    contents = {member: source.encode("utf-8") for member, source in sources.items()}
+    archive_format = get_archive_format(archive)
+    if archive_format == "zip":
+        with zipfile.ZipFile(archive) as source, zipfile.ZipFile(output, "w") as target:
+            for info in source.infolist():
+                if info.filename in contents:
+                    write_zip_member(target, info, contents[info.filename])
+                elif info.filename.endswith(".dist-info/RECORD") and archive.lower().endswith(".whl"):
+                    write_zip_member(target, info, update_record(source.read(info), contents))
+                else:
+                    copy_zip_member(source, target, info)
+    else:
+        with tarfile.open(archive, "r|*") as source, tarfile.open(output, "w|" + archive_format) as target:
+            for member in source:
+                if member.name in contents:
+                    member.size = len(contents[member.name])
+                    target.addfile(member, io.BytesIO(contents[member.name]))
+                elif member.isfile():
+                    target.addfile(member, source.extractfile(member))
+                else:
+                    target.addfile(member)
+
+
+def write_zip_member(target, info, content):
+    """
+    It writes a new content for a member of a zip archive, keeping its compression, date and permissions.
+    :param target: The ZipFile object of the new archive
+    :param info: The ZipInfo object of the original member
+    :param content: The bytes of the new content
+    :return:
+    """
+    new_info = zipfile.ZipInfo(info.filename, info.date_time)
+    new_info.compress_type = info.compress_type
+    new_info.external_attr = info.external_attr
+    new_info.create_system = info.create_system
+    new_info.comment = info.comment
+    target.writestr(new_info, content)
+
+
+def copy_zip_member(source, target, info):
+    """
+    It copies a member of a zip archive to other zip archive without decompressing it. The compressed data is read from
+    the original archive and written after a new local header.
+    :param source: The ZipFile object of the original archive
+    :param target: The ZipFile object of the new archive
+    :param info: The ZipInfo object of the member
+    :return:
+    """
+    source.fp.seek(info.header_offset)
+    header = source.fp.read(zipfile.sizeFileHeader)
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    source.fp.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+
+    # The sizes and the checksum are written in the local header, so the member does not need a data descriptor
+    new_info = copy.copy(info)
+    new_info.flag_bits &= ~0x08
+    new_info.header_offset = target.fp.tell()
+    target.fp.write(new_info.FileHeader())
+    remaining = info.compress_size
+    while remaining > 0:
+        chunk = source.fp.read(min(remaining, 1048576))
+        if not chunk:
+            raise zipfile.BadZipFile("the member " + info.filename + " is truncated")
+        target.fp.write(chunk)
+        remaining -= len(chunk)
+    target.filelist.append(new_info)
+    target.NameToInfo[new_info.filename] = new_info
+    target.start_dir = target.fp.tell()
+
+
+def update_record(record, contents):
+    """
+    It updates the hashes and the sizes of the mutated members in the RECORD file of a wheel.
+    :param record: The bytes of the RECORD file
+    :param contents: A dictionary with the names of the mutated members as keys and their new content as values
+    :return: The bytes of the new RECORD file
+    """
+    rows = []
+    for row in csv.reader(io.StringIO(record.decode("utf-8"))):
+        if row and row[0] in contents:
+            content = contents[row[0]]
+            digest = base64.urlsafe_b64encode(hashlib.sha256(content).digest()).rstrip(b"=").decode()
+            row = [row[0], "sha256=" + digest, str(len(content))]
+        rows.append(row)
+    output = io.StringIO()
+    csv.writer(output, lineterminator=chr(10)).writerows(rows)
+    return output.getvalue().encode("utf-8")
+
+
 if __name__ == "__main__":
     main()